@@ -1,55 +1,140 @@
 import numpy as np
 import scipy.io.wavfile as wavfile
-import requests
 import secrets
 import hashlib
 import time
 import json
-import google.generativeai as genai
 import random
+import os
+import argparse
+import itertools
+import threading
+import sqlite3
+import shutil
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeout
+from wavstream import StreamingWavWriter
+from stems import create_stems, load_stems, write_mixdown, stem_path, manifest_path as stems_manifest_path
+from library import register_track
+import profiling
 
 # --- CONFIGURATION ---
 # !!! PASTE YOUR API KEY HERE !!!
 GOOGLE_API_KEY = "YOURAPIKEYPASTEHERE"
 
 MODEL_NAME = 'gemini-2.5-flash'
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel(MODEL_NAME)
+
+# Latency budgets (seconds). Past these we stop waiting and play with what we have.
+QRNG_BUDGET_SECONDS = 1.0
+SESSION_BUDGET_SECONDS = 8.0
+
+CACHE_DIR = os.environ.get("SEDUCER_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "the-seducer"))
 
 SAMPLE_RATE = 44100
 TARGET_DURATION_SECONDS = 130 
 
 # --- 1. CHAOS ENGINE (The Soul Source) ---
-def get_quantum_seed():
-    hw = secrets.token_bytes(32)
-    qw = b''
+QRNG_URL = "https://qrng.anu.edu.au/API/jsonI.php?length={count}&type=hex16&size=32"
+QRNG_POOL_PATH = os.path.join(CACHE_DIR, "qrng_pool.bin")
+QRNG_POOL_REFILL = 16 # 32-byte blocks fetched per refill
+
+def in_background(fn, *args):
+    """
+    Runs fn in a daemon thread and returns a Future for its result.
+    A call we gave up on (budget blown) never holds up the program's exit.
+    """
+    future = Future()
+    def work():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    threading.Thread(target=work, daemon=True).start()
+    return future
+
+def fetch_quantum_bytes(count=1, timeout=QRNG_BUDGET_SECONDS):
+    """Fetches count blocks of real quantum randomness (32 bytes each) from ANU. b'' on any failure."""
+    import requests # Imported lazily: it's slow to import and only needed here
     try:
-        # Fetch real quantum randomness from ANU
-        url = "https://qrng.anu.edu.au/API/jsonI.php?length=1&type=hex16&size=32"
-        r = requests.get(url, timeout=1)
+        r = requests.get(QRNG_URL.format(count=count), timeout=timeout)
         if r.status_code == 200:
-            qw = bytes.fromhex(r.json()['data'][0])
-    except:
+            return b''.join(bytes.fromhex(block) for block in r.json()['data'])
+    except Exception:
         pass
+    return b''
+
+def refill_quantum_pool():
+    fresh = fetch_quantum_bytes(QRNG_POOL_REFILL)
+    if fresh:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(QRNG_POOL_PATH, "ab") as f:
+            f.write(fresh)
+
+def take_quantum_bytes():
+    """
+    Takes 32 banked quantum bytes (each used only once) and tops the bank up in the background.
+    We never wait on the network here: the first run on a new machine just has none yet.
+    """
+    try:
+        with open(QRNG_POOL_PATH, "rb") as f:
+            pool = f.read()
+    except OSError:
+        pool = b''
+    qw, rest = pool[:32], pool[32:]
+    if qw:
+        tmp_path = f"{QRNG_POOL_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(rest)
+        os.replace(tmp_path, QRNG_POOL_PATH)
+    if len(rest) < 64:
+        in_background(refill_quantum_pool)
+    return qw
+
+@profiling.profiled("qrng")
+def get_quantum_seed():
+    hw = secrets.token_bytes(32)
+    qw = take_quantum_bytes()
     tw = str(time.time_ns()).encode()
     hasher = hashlib.sha256()
     hasher.update(hw + qw + tw)
     seed = int(hasher.hexdigest(), 16) % (2**32)
     
-    # SEED PYTHON'S RANDOMNESS WITH THIS HARDWARE SEED
-    # This ensures the "Improv" is unique to this specific moment/hardware state.
-    random.seed(seed)
-    np.random.seed(seed % (2**32))
-    
-    print(f"--- QUANTUM SOUL SEED: {seed} ---")
+    print(f"--- QUANTUM SOUL SEED: {seed}{'' if qw else ' (no quantum bytes banked yet)'} ---")
     return seed
 
+def make_rngs(seed):
+    """
+    The track's own randomness, derived only from its seed.
+    This keeps the "Improv" unique to the seed, and lets many tracks render side by side
+    without sharing (or fighting over) the global random state.
+    Returns (note decisions: random.Random, audio noise: np.random.Generator).
+    """
+    return random.Random(seed), np.random.default_rng(seed)
+
 # --- 2. THE SESSION LEADER (AI) ---
 # We only ask the AI for the "Sheet Music" (Chords/Scale), NOT the notes.
-def get_session_params(seed):
-    print(f"Contacting {MODEL_NAME} for Session Sheet Music...")
-    
-    prompt = f"""
+SESSION_CACHE_DIR = os.path.join(CACHE_DIR, "sessions")
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """Builds the Gemini client on first use, so importing app.py stays cheap."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=GOOGLE_API_KEY)
+            _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
+def session_cache_path(prompt):
+    key = hashlib.sha256(f"{MODEL_NAME}\n{prompt}".encode()).hexdigest()
+    return os.path.join(SESSION_CACHE_DIR, f"{key}.json")
+
+def session_prompt(seed):
+    return f"""
     You are a Jazz Bandleader. Seed: {seed}.
     Define a 2-chord "Vamp" for a soulful R&B track (Style: Sade, Grover Washington).
     
@@ -62,15 +147,90 @@ def get_session_params(seed):
       "chord_2": [float_freqs]  // e.g. Bb13
     }}
     """
+
+def get_session_params(seed, timeout=SESSION_BUDGET_SECONDS):
+    prompt = session_prompt(seed)
+
+    # The same prompt (and seed) always gets the same sheet music back from disk
+    cache_path = session_cache_path(prompt)
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    print(f"Contacting {MODEL_NAME} for Session Sheet Music...")
     try:
-        response = model.generate_content(prompt)
+        response = get_model().generate_content(prompt, request_options={"timeout": timeout})
         text = response.text
         start_idx = text.find('{')
         end_idx = text.rfind('}') + 1
-        return json.loads(text[start_idx:end_idx])
+        params = json.loads(text[start_idx:end_idx])
     except:
         return None
 
+    os.makedirs(SESSION_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(params, f)
+    os.replace(tmp_path, cache_path)
+    return params
+
+# -- Session Providers --
+# Anything that can turn a seed into sheet music: bpm, root_freq, scale_intervals, chord_1, chord_2.
+class SessionProvider:
+    name = "base"
+
+    def session_params(self, seed):
+        raise NotImplementedError
+
+class GeminiProvider(SessionProvider):
+    """Asks the AI bandleader (network, API key)."""
+    name = "gemini"
+
+    def session_params(self, seed):
+        return get_session_params(seed)
+
+class LocalProvider(SessionProvider):
+    """A deterministic stand-in bandleader: same seed, same vibe, no network."""
+    name = "local"
+    SCALES = [[0, 3, 5, 7, 10], [0, 2, 3, 5, 7, 9, 10]] # Minor Pentatonic, Dorian
+    ROOTS = [43.65, 46.25]                              # Low F, Low F#
+    CHORD_1 = [0, 3, 7, 10, 14]                         # m9 on the tonic (e.g. Fm9)
+    CHORD_2 = [5, 9, 15, 19, 26]                        # 13 on the fourth (e.g. Bb13)
+
+    def session_params(self, seed):
+        rng = random.Random(f"session-{seed}")
+        root = rng.choice(self.ROOTS)
+        voicing = root * 4 # Comp two octaves above the bass
+        return {
+            "bpm": rng.randint(75, 85),
+            "root_freq": root,
+            "scale_intervals": rng.choice(self.SCALES),
+            "chord_1": [round(voicing * 2**(i/12), 2) for i in self.CHORD_1],
+            "chord_2": [round(voicing * 2**(i/12), 2) for i in self.CHORD_2],
+        }
+
+PROVIDERS = {p.name: p for p in (GeminiProvider, LocalProvider)}
+
+@profiling.profiled("session")
+def fetch_session(provider, seed, budget=SESSION_BUDGET_SECONDS):
+    """
+    Gets sheet music from provider within budget seconds.
+    If the bandleader is late or has nothing, the local stand-in fills in so the band can start.
+    """
+    try:
+        params = in_background(provider.session_params, seed).result(timeout=budget)
+    except FutureTimeout:
+        print(f"[{seed}] The {provider.name} bandleader took over {budget:g}s, playing a local vibe instead.")
+        params = None
+    except Exception as e:
+        print(f"[{seed}] The {provider.name} bandleader failed ({e}), playing a local vibe instead.")
+        params = None
+    if not params and provider.name != LocalProvider.name:
+        params = LocalProvider().session_params(seed)
+    return params
+
 # --- 3. THE IMPROVISER (Python Logic) ---
 # This replaces the AI generation for notes. It "plays" live.
 
@@ -83,75 +243,258 @@ def get_scale_notes(root, intervals, octave_range=2):
             pool.append(f * (2**octave))
     return sorted(pool)
 
+# A lick is up to LICK_SLOTS notes. Licks are improvised a whole run of bars (or many arrangements)
+# at a time as (..., bars, LICK_SLOTS) arrays of start step, scale index and duration, plus a mask
+# of which slots are played. Every bar takes LICK_DRAWS uniforms, whether it plays or rests:
+LICK_SLOTS = 8
+LICK_JUMPS = np.array([-1, -1, 0, 1, 1, 2, -2]) # Stepwise motion is more melodic than random jumps
+LICK_DURATIONS = np.array([2, 4, 8])            # Short, Medium, Long (16th-note steps)
+LICK_GAPS = np.array([2, 4])                    # Syncopation: each note waits 2 or 4 steps
+LICK_DRAWS = 2 + 3 * LICK_SLOTS                 # rest?, length, then jump/duration/gap per slot
+LICK_BATCH_BARS = 64                            # Bars improvised per call while composing
+LICK_CHUNK_DRAWS = 1 << 18                      # improvise_many: uniforms per pass, small enough to stay in cache
+
+# Lick uniforms come from a counter-based stream: draw n of seed s is a hash of (s, n), so it doesn't
+# matter how the draws are batched, and many seeds cost one vectorized pass instead of one Generator each.
+LICK_GAMMA = np.uint64(0x9E3779B97F4A7C15) # SplitMix64's step between consecutive draws
+
+def mix64(x):
+    """SplitMix64's finalizer, in place: scrambles uint64s so consecutive inputs come out independent."""
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+def lick_uniforms(seeds, counters):
+    """
+    float32 uniforms in [0, 1): draw number counters of each seed's stream (seeds and counters broadcast).
+    seeds must be an array (not a bare scalar), so the uint64 arithmetic wraps around silently.
+    """
+    keys = mix64(np.array(seeds, dtype=np.uint64))
+    bits = mix64(keys + (np.asarray(counters, dtype=np.uint64) + np.uint64(1)) * LICK_GAMMA)
+    bits >>= np.uint64(40)
+    uniforms = bits.astype(np.float32)
+    uniforms *= np.float32(2.0 ** -24)
+    return uniforms
+
+def lick_counters(bars, first=0):
+    """Draw numbers for a run of bars, slot-major: (LICK_DRAWS, bars), bar after bar from draw `first`."""
+    return first + np.arange(bars * LICK_DRAWS, dtype=np.uint64).reshape(bars, LICK_DRAWS).T
+
+def pick(choices, u):
+    """choices[floor(u * len(choices))], for uniforms u in [0, 1)."""
+    return choices.take((u * len(choices)).astype(np.intp))
+
+# The sax's stepwise walk, x -> clip(x + jump, 0, last note), as maps (add, lo, hi) that compose:
+# (a1, l1, h1) then (a2, l2, h2) is (a1 + a2, clip(l1 + a2, l2, h2), clip(h1 + a2, l2, h2)).
+# So every prefix of a walk comes out of a Hillis-Steele scan in log2(length) vectorized passes.
+def scan_clamps(add, lo, hi):
+    """Inclusive scan of clamp maps along the first axis, in place."""
+    shift = 1
+    while shift < len(add):
+        a1, l1, h1 = add[:-shift], lo[:-shift], hi[:-shift]
+        a2, l2, h2 = add[shift:], lo[shift:], hi[shift:]
+        lo_new = np.minimum(np.maximum(l1 + a2, l2), h2)
+        hi_new = np.minimum(np.maximum(h1 + a2, l2), h2)
+        add[shift:] = a1 + a2
+        lo[shift:] = lo_new
+        hi[shift:] = hi_new
+        shift *= 2
+
+def apply_clamps(x, add, lo, hi):
+    return np.minimum(np.maximum(x + add, lo), hi)
+
+def improvise(draws, intensities, scale_len, start_idx):
+    """
+    The lick rules on pre-drawn uniforms, for any number of arrangements at once.
+    draws is (LICK_DRAWS, ..., bars): slot-major, so every per-slot operation works on one large block.
+    intensities is (bars,) and start_idx is where each walk starts.
+    Returns ((step, note_idx, dur, mask), each (..., bars, LICK_SLOTS); where each walk ended).
+    """
+    intensities = np.asarray(intensities, dtype=np.float64)
+    jumps = pick(LICK_JUMPS, draws[2:2 + LICK_SLOTS])
+    dur = pick(LICK_DURATIONS, draws[2 + LICK_SLOTS:2 + 2 * LICK_SLOTS])
+    gaps = pick(LICK_GAPS, draws[2 + 2 * LICK_SLOTS:])
+
+    # Soul Rule 1: Breathe. Don't play all the time.
+    plays = draws[0] <= intensities
+    # Phrase length: 3-8 notes when it's hot, 1-4 otherwise
+    num_notes = np.where(intensities > 0.6, 3 + (draws[1] * 6).astype(int), 1 + (draws[1] * 4).astype(int))
+    slots = np.arange(LICK_SLOTS).reshape((-1,) + (1,) * plays.ndim)
+    mask = plays & (slots < num_notes)
+
+    # Each note starts a gap after the previous one ended
+    step = np.cumsum(gaps + dur, axis=0) - dur
+
+    # The walk carries on from bar to bar. Rests are maps with unreachable bounds, i.e. no-ops.
+    # Scan within each bar, then across the bars' whole-bar maps, then place every note.
+    unbounded = 2 * LICK_SLOTS * mask.shape[-1] + scale_len
+    add = np.where(mask, jumps, 0).astype(np.int32)
+    lo = np.where(mask, 0, -unbounded).astype(np.int32)
+    hi = np.where(mask, scale_len - 1, unbounded).astype(np.int32)
+    scan_clamps(add, lo, hi)
+    bar_maps = [np.moveaxis(m[-1], -1, 0).copy() for m in (add, lo, hi)]
+    scan_clamps(*bar_maps)
+
+    start_idx = np.asarray(start_idx, dtype=np.int32)
+    bar_end = apply_clamps(start_idx, *bar_maps)
+    bar_begin = np.moveaxis(np.concatenate([start_idx[None], bar_end[:-1]]), 0, -1)
+    note_idx = apply_clamps(bar_begin, add, lo, hi)
+    licks = tuple(np.moveaxis(a, 0, -1) for a in (step, note_idx, dur, mask))
+    return licks, bar_end[-1]
+
 class SoulImproviser:
-    def __init__(self, scale_notes):
+    def __init__(self, scale_notes, seed=None):
         self.scale = scale_notes
+        self.seed = secrets.randbits(64) if seed is None else seed # Its own stream of lick uniforms
+        self.drawn = 0
         self.last_note_idx = len(scale_notes) // 2 # Start in middle
-        
+
+    def play_licks(self, intensities):
+        """Licks for a run of bars at once, one intensity per bar. Returns (step, note_idx, dur, mask) arrays."""
+        draws = lick_uniforms([self.seed], lick_counters(len(intensities), self.drawn))
+        self.drawn += len(intensities) * LICK_DRAWS
+        licks, last_idx = improvise(draws, intensities, len(self.scale), self.last_note_idx)
+        self.last_note_idx = int(last_idx)
+        return licks
+
     def play_lick(self, intensity=0.5):
         """Generates a jazz phrase (lick) based on current intensity."""
-        phrase = []
-        
-        # Soul Rule 1: Breathe. Don't play all the time.
-        if random.random() > intensity: 
-            return [] # Rest for this bar
-            
-        # Determine phrase length
-        num_notes = random.randint(3, 8) if intensity > 0.6 else random.randint(1, 4)
-        
-        current_step = 0
-        for _ in range(num_notes):
-            # Walk up/down the scale (stepwise motion is more melodic than random jumps)
-            step_jump = random.choice([-1, -1, 0, 1, 1, 2, -2])
-            self.last_note_idx = max(0, min(len(self.scale)-1, self.last_note_idx + step_jump))
-            
-            freq = self.scale[self.last_note_idx]
-            
-            # Rhythm: Syncopation
-            # Choose a start step (16th notes): 0, 2, 3, 6, etc.
-            duration = random.choice([2, 4, 8]) # Short, Medium, Long
-            start_step = current_step + random.choice([2, 4])
-            
-            phrase.append({"step": start_step, "freq": freq, "dur": duration})
-            current_step = start_step + duration
-            
-        return phrase
+        step, note_idx, dur, mask = (a[0] for a in self.play_licks([intensity]))
+        return [{"step": int(s), "freq": self.scale[i], "dur": int(d)}
+                for s, i, d in zip(step[mask], note_idx[mask], dur[mask])]
+
+def improvise_many(scale_notes, intensities, seeds):
+    """
+    Whole arrangements for many seeds at once, e.g. to score candidates and keep the best.
+    Row i is exactly what SoulImproviser(scale_notes, seeds[i]).play_licks(intensities) plays.
+    Returns (step, note_idx, dur, mask), each (seeds, bars, LICK_SLOTS).
+    """
+    seeds = np.asarray(seeds, dtype=np.uint64)
+    counters = lick_counters(len(intensities))[:, None, :]
+    rows = max(1, LICK_CHUNK_DRAWS // max(1, counters.size))
+    parts = []
+    for first in range(0, max(1, len(seeds)), rows):
+        chunk = seeds[first:first + rows]
+        draws = lick_uniforms(chunk[:, None], counters)
+        licks, _ = improvise(draws, intensities, len(scale_notes), np.full(len(chunk), len(scale_notes) // 2))
+        parts.append(licks)
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+def licks_by_bar(player, structure, batch=LICK_BATCH_BARS):
+    """
+    Yields each bar's lick as (steps, scale indices, durations) of the notes played.
+    Improvises `batch` bars per call, so endless structures work too.
+    """
+    sections = iter(structure)
+    while True:
+        block = list(itertools.islice(sections, batch))
+        if not block:
+            return
+        step, note_idx, dur, mask = player.play_licks([SECTION_INTENSITY.get(s, 0.0) for s in block])
+        for bar in range(len(block)):
+            yield step[bar][mask[bar]], note_idx[bar][mask[bar]], dur[bar][mask[bar]]
 
 # --- 4. DSP INSTRUMENTS (Soulful & Imperfect) ---
 
-def mix(master, sound, loc, vol=1.0):
-    if loc < 0: return
-    if loc + len(sound) >= len(master):
-        avail = len(master) - loc
-        if avail <= 0: return
-        sound = sound[:avail]
-    master[loc:loc+len(sound)] += sound * vol
+# -- Waveform Cache --
+# The sax only ever plays a handful of scale notes at three lengths, and the keys loop two chords.
+# So we synthesize the deterministic tone once and only add the per-note "human" part on every hit.
+WAVE_CACHE_BYTES = 256 * 1024 * 1024
+
+class WaveformCache:
+    """LRU of synthesized tones keyed by (instrument, freq, duration, sample rate, ...)."""
+    def __init__(self, max_bytes=WAVE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.waves = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        waves = self.waves.get(key)
+        if waves is not None:
+            self.hits += 1
+            profiling.count("notes_reused")
+            self.waves.move_to_end(key)
+            return waves
+
+        self.misses += 1
+        profiling.count("notes_synthesized")
+        waves = build()
+        for w in waves:
+            w.setflags(write=False) # Shared between notes, so nobody may mix into it in place
+        self.waves[key] = waves
+        self.bytes += sum(w.nbytes for w in waves)
+        while self.bytes > self.max_bytes and len(self.waves) > 1:
+            _, old = self.waves.popitem(last=False)
+            self.bytes -= sum(w.nbytes for w in old)
+        return waves
+
+WAVE_CACHE = WaveformCache()
 
 # -- Drifting Keys (Analog Pitch Drift) --
+# The drift LFO starts at a random phase in [0, 1) rad. We snap it to one of these steps
+# so each chord tone only ever needs a few cached variants (at most 0.4 cents apart, inaudible).
+KEYS_DRIFT_PHASES = 4
+
+def keys_modulator(f, duration, sample_rate=SAMPLE_RATE):
+    """The drift-free part of the carrier's phase, shared by every drift step of one chord tone."""
+    t = np.linspace(0, duration, int(sample_rate * duration))
+
+    # Smooth FM Tone
+    mod = np.sin(2 * np.pi * f * t) * f * 0.5 * np.exp(-5 * t)
+    return (2 * np.pi * f * t + mod,)
+
+def keys_drift(duration, phase_step, sample_rate=SAMPLE_RATE):
+    """Extra carrier phase per Hz of pitch from the drift LFO, shared by every chord tone."""
+    t = np.linspace(0, duration, int(sample_rate * duration))
+
+    # PITCH DRIFT: The "Warble" of old tape
+    drift = 0.002 * np.sin(2 * np.pi * 0.5 * t + (phase_step + 0.5) / KEYS_DRIFT_PHASES)
+    return (2 * np.pi * drift * t,)
+
+def keys_voice(f, duration, phase_step, sample_rate=SAMPLE_RATE):
+    modulator, = WAVE_CACHE.get(("keys-mod", f, duration, sample_rate),
+                                lambda: keys_modulator(f, duration, sample_rate))
+    drift, = WAVE_CACHE.get(("keys-drift", duration, sample_rate, phase_step),
+                            lambda: keys_drift(duration, phase_step, sample_rate))
+    # float32 is plenty for a cached voice and halves the cache footprint of bar-long tones
+    return (np.sin(modulator + f * drift).astype(np.float32),)
+
+def keys_envelope(duration, sample_rate=SAMPLE_RATE):
+    env = np.ones(int(sample_rate * duration))
+    env[:1000] = np.linspace(0, 1, 1000)
+    env[-5000:] = np.linspace(1, 0, 5000)
+    return (env * 0.3,)
+
+def keys_waves(f, duration, phase_step, sample_rate=SAMPLE_RATE):
+    """Cached (carrier, envelope) for one chord tone."""
+    carrier, = WAVE_CACHE.get(("keys", f, duration, sample_rate, phase_step),
+                              lambda: keys_voice(f, duration, phase_step, sample_rate))
+    env, = WAVE_CACHE.get(("keys-env", duration, sample_rate), lambda: keys_envelope(duration, sample_rate))
+    return carrier, env
+
+def keys_pitch(f):
+    """Chord tones above 800Hz are dropped an octave to keep the comping warm."""
+    return f / 2 if f > 800 else f
+
 def synth_keys_drift(freqs, duration):
-    t = np.linspace(0, duration, int(SAMPLE_RATE * duration))
-    master = np.zeros_like(t)
+    master = np.zeros(int(SAMPLE_RATE * duration))
     
     for f in freqs:
-        if f > 800: f /= 2 
-        
-        # PITCH DRIFT: The "Warble" of old tape
-        drift = 1.0 + 0.002 * np.sin(2 * np.pi * 0.5 * t + random.random())
-        
-        # Smooth FM Tone
-        mod = np.sin(2 * np.pi * f * t) * f * 0.5 * np.exp(-5 * t)
-        carrier = np.sin(2 * np.pi * (f * drift) * t + mod)
+        phase_step = int(random.random() * KEYS_DRIFT_PHASES)
+        carrier, env = keys_waves(keys_pitch(f), duration, phase_step)
         master += carrier
 
-    env = np.ones_like(t)
-    env[:1000] = np.linspace(0, 1, 1000)
-    env[-5000:] = np.linspace(1, 0, 5000)
-    
-    return master * env * 0.3
+    return master * env
 
 # -- Expressive Sax (Vibrato changes over time) --
-def synth_sax_soul(freq, duration):
-    t = np.linspace(0, duration, int(SAMPLE_RATE * duration))
+def sax_tone(freq, duration, sample_rate=SAMPLE_RATE):
+    """The deterministic part of a sax note: (shaped tone, envelope the breath noise goes through)."""
+    t = np.linspace(0, duration, int(sample_rate * duration))
     
     # Expressive Vibrato: Starts flat, then widens (classic soul technique)
     vib_envelope = np.linspace(0, 1, len(t)) ** 2 # Delayed vibrato
@@ -161,133 +504,934 @@ def synth_sax_soul(freq, duration):
     scoop = np.exp(-20 * t) * -20 # Starts 20Hz flat, quickly corrects
     
     freq_mod = freq + vib + scoop
-    phase = 2 * np.pi * np.cumsum(freq_mod) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(freq_mod) / sample_rate
     
     # Waveform: Saturation
     tone = np.tanh(np.sin(phase) * 2.5)
     
-    # Breath/Air noise
-    breath = np.random.uniform(-0.05, 0.05, len(t))
-    
     # Dynamics Envelope
     env = np.ones_like(t)
-    attack = int(0.08 * SAMPLE_RATE)
+    attack = int(0.08 * sample_rate)
     env[:attack] = np.linspace(0, 1, attack)
     env[-attack:] = np.linspace(1, 0, attack)
     
-    return (tone + breath) * env * 0.45
+    env = env * 0.45
+    return tone * env, env
+
+def sax_waves(freq, duration, sample_rate=SAMPLE_RATE):
+    return WAVE_CACHE.get(("sax", freq, duration, sample_rate), lambda: sax_tone(freq, duration, sample_rate))
+
+def synth_sax_soul(freq, duration):
+    tone, env = sax_waves(freq, duration)
+    
+    # Breath/Air noise: fresh for every note, shaped by the same envelope as the tone
+    breath = np.random.uniform(-0.05, 0.05, len(tone))
+    return tone + breath * env
 
 # -- The Groove Section --
-def synth_kick_thump():
-    t = np.linspace(0, 0.3, int(SAMPLE_RATE * 0.3))
+DRUM_SECONDS = {"kick": 0.3, "snare": 0.1, "hat": 0.05}
+
+def synth_kick_thump(sample_rate=SAMPLE_RATE, rng=None):
+    t = np.linspace(0, DRUM_SECONDS["kick"], int(sample_rate * DRUM_SECONDS["kick"]))
     freq = 70 * np.exp(-10 * t) + 30
     return np.sin(2 * np.pi * freq * t) * np.exp(-6 * t)
 
-def synth_snare_rim():
-    t = np.linspace(0, 0.1, int(SAMPLE_RATE * 0.1))
-    return (np.random.uniform(-0.6, 0.6, len(t)) + np.sin(2*np.pi*400*t)) * np.exp(-20*t) * 0.6
+def synth_snare_rim(sample_rate=SAMPLE_RATE, rng=np.random):
+    t = np.linspace(0, DRUM_SECONDS["snare"], int(sample_rate * DRUM_SECONDS["snare"]))
+    return (rng.uniform(-0.6, 0.6, len(t)) + np.sin(2*np.pi*400*t)) * np.exp(-20*t) * 0.6
 
-def synth_hat_soft():
-    t = np.linspace(0, 0.05, int(SAMPLE_RATE * 0.05))
-    return np.random.uniform(-0.4, 0.4, len(t)) * np.exp(-40*t) * 0.3
+def synth_hat_soft(sample_rate=SAMPLE_RATE, rng=np.random):
+    t = np.linspace(0, DRUM_SECONDS["hat"], int(sample_rate * DRUM_SECONDS["hat"]))
+    return rng.uniform(-0.4, 0.4, len(t)) * np.exp(-40*t) * 0.3
 
-# --- MAIN ENGINE ---
-def generate_soul_track():
-    if GOOGLE_API_KEY == "myapikey":
-        print("ERROR: Paste API Key")
-        return
+# --- 5. THE SCORE (Phase 1: every decision, no audio) ---
+# The whole arrangement becomes one structured array of events. Because it's plain data,
+# it can be saved, diffed, and rendered again later (even at another sample rate).
+INSTRUMENTS = ["kick", "snare", "hat", "keys", "sax"]
+KICK, SNARE, HAT, KEYS, SAX = range(len(INSTRUMENTS))
+DRUM_SYNTHS = {KICK: synth_kick_thump, SNARE: synth_snare_rim, HAT: synth_hat_soft}
 
-    seed = get_quantum_seed()
-    
-    # 1. Ask AI for the "Vibe" (Scale & Chords)
-    params = get_session_params(seed)
-    if not params: return
+# start is in samples at the score's rate, dur in seconds.
+# phase is the keys' drift step (humanization is decided here, not while rendering).
+SCORE_DTYPE = np.dtype([("instrument", "u1"), ("start", "i8"), ("freq", "f8"),
+                        ("dur", "f8"), ("vol", "f4"), ("phase", "u1")])
+
+# 4 bars Intro (Solo), 16 bars Verse (Quiet), 8 bars Chorus (Licks), 8 bars Verse, 4 bars Outro (Solo)
+SONG_STRUCTURE = ["Intro"]*4 + ["Verse"]*16 + ["Chorus"]*8 + ["Verse"]*8 + ["Outro"]*4
 
+SECTION_INTENSITY = {
+    "Intro": 0.9,  # Soloing hard
+    "Outro": 0.9,
+    "Chorus": 0.4, # Tasty licks
+    "Verse": 0.1,  # Very sparse (leave room for vocals)
+}
+
+def read_session(params):
+    """Pulls the bandleader's sheet music out of params, with defaults for anything missing."""
     bpm = params.get("bpm", 80)
     root = params.get("root_freq", 43.65)
     intervals = params.get("scale_intervals", [0, 3, 5, 7, 10])
     chord1 = params.get("chord_1", [root*2, root*2.4])
     chord2 = params.get("chord_2", [root*3, root*3.6])
-    
-    print(f"BPM: {bpm} | Key: {root:.1f}Hz")
+    return bpm, root, intervals, chord1, chord2
+
+def build_structure(bars=None):
+    """SONG_STRUCTURE, or an arrangement of about `bars` bars: Intro, Verse/Chorus cycles, Outro."""
+    if not bars:
+        return SONG_STRUCTURE
+    cycle = ["Verse"]*16 + ["Chorus"]*8 + ["Verse"]*8
+    middle = cycle * (max(0, bars - 8) // len(cycle) + 1)
+    return ["Intro"]*4 + middle[:max(0, bars - 8)] + ["Outro"]*4
+
+def bar_start(bar_idx, bpm, sample_rate=SAMPLE_RATE):
+    return int(bar_idx * (60 / bpm) * 4 * sample_rate)
 
-    # 2. Setup Timing
+def compose_bars(bpm, chord1, chord2, scale_notes, structure=SONG_STRUCTURE, sample_rate=SAMPLE_RATE,
+                 rng=random):
+    """Plays the arrangement "on paper", a bar at a time. Yields (bar_idx, that bar's events)."""
     beat_dur = 60 / bpm
     step_len = beat_dur / 4
     bar_dur = beat_dur * 4
-    
-    # 3. Setup Improviser
-    scale_notes = get_scale_notes(root, intervals)
-    sax_player = SoulImproviser(scale_notes)
-    
-    # 4. Define Structure
-    # 4 bars Intro (Solo), 16 bars Verse (Quiet), 8 bars Chorus (Licks), 8 bars Verse, 4 bars Outro (Solo)
-    structure = ["Intro"]*4 + ["Verse"]*16 + ["Chorus"]*8 + ["Verse"]*8 + ["Outro"]*4
-    
-    total_samples = int(len(structure) * bar_dur * SAMPLE_RATE)
-    master = np.zeros(total_samples + 88200)
-    
-    kick = synth_kick_thump()
-    snare = synth_snare_rim()
-    hat = synth_hat_soft()
-    
-    print(f"Improvising over {len(structure)} bars...")
-    
-    for bar_idx, section in enumerate(structure):
-        bar_offset_samples = int(bar_idx * bar_dur * SAMPLE_RATE)
+
+    # The sax improvises with its own Generator, seeded from the track's note decisions
+    sax_player = SoulImproviser(scale_notes, rng.getrandbits(64))
+
+    for bar_idx, lick in enumerate(licks_by_bar(sax_player, structure)):
+        bar_offset_samples = bar_start(bar_idx, bpm, sample_rate)
+        events = []
         
         # --- A. DRUMS (Humanized) ---
         # Basic Groove: Kick on 1, Snare on 3 (Half time feel)
         # Add random "ghost notes"
-        
-        # Beat 1 (Kick)
-        mix(master, kick, bar_offset_samples) 
-        # Beat 2 (Hat)
-        mix(master, hat, bar_offset_samples + int(beat_dur * SAMPLE_RATE))
-        # Beat 3 (Snare + Kick lag)
-        mix(master, snare, bar_offset_samples + int(beat_dur * 2 * SAMPLE_RATE))
-        # Beat 4 (Hat)
-        mix(master, hat, bar_offset_samples + int(beat_dur * 3 * SAMPLE_RATE))
+        events.append((KICK, bar_offset_samples, 0, DRUM_SECONDS["kick"], 1.0, 0))                                   # Beat 1
+        events.append((HAT, bar_offset_samples + int(beat_dur * sample_rate), 0, DRUM_SECONDS["hat"], 1.0, 0))       # Beat 2
+        events.append((SNARE, bar_offset_samples + int(beat_dur * 2 * sample_rate), 0, DRUM_SECONDS["snare"], 1.0, 0)) # Beat 3
+        events.append((HAT, bar_offset_samples + int(beat_dur * 3 * sample_rate), 0, DRUM_SECONDS["hat"], 1.0, 0))   # Beat 4
         
         # Random Fills (Ghost kicks)
-        if random.random() > 0.7:
-             mix(master, kick, bar_offset_samples + int(beat_dur * 2.5 * SAMPLE_RATE), vol=0.6)
+        if rng.random() > 0.7:
+            events.append((KICK, bar_offset_samples + int(beat_dur * 2.5 * sample_rate), 0, DRUM_SECONDS["kick"], 0.6, 0))
 
         # --- B. KEYS (Comping) ---
-        # Switch chords every bar (Vamp)
+        # Switch chords every bar (Vamp), played at the start of the bar
         current_chord = chord1 if bar_idx % 2 == 0 else chord2
-        
-        # Play chord at start of bar
-        mix(master, synth_keys_drift(current_chord, bar_dur), bar_offset_samples, vol=0.5)
+        for f in current_chord:
+            phase_step = int(rng.random() * KEYS_DRIFT_PHASES)
+            events.append((KEYS, bar_offset_samples, keys_pitch(f), bar_dur, 0.5, phase_step))
         
         # --- C. SAXOPHONE (The Soul) ---
-        # Determine intensity based on section
-        intensity = 0.0
-        if section == "Intro" or section == "Outro":
-            intensity = 0.9 # Soloing hard
-        elif section == "Chorus":
-            intensity = 0.4 # Tasty licks
-        elif section == "Verse":
-            intensity = 0.1 # Very sparse (leave room for vocals)
-            
-        # Get Lick from Improviser Class
-        lick = sax_player.play_lick(intensity)
-        
-        for note in lick:
+        for step, note_idx, dur in zip(*lick):
             # Humanize Timing: Play slightly "behind the beat" (lag)
-            lag = random.randint(1000, 5000) 
+            lag = rng.randint(1000, 5000) 
             
-            t_start = bar_offset_samples + int(note["step"] * step_len * SAMPLE_RATE) + lag
-            mix(master, synth_sax_soul(note["freq"], note["dur"] * step_len), t_start)
+            t_start = bar_offset_samples + int(step * step_len * sample_rate) + lag
+            events.append((SAX, t_start, scale_notes[note_idx], dur * step_len, 1.0, 0))
+
+        yield bar_idx, np.array(events, dtype=SCORE_DTYPE)
+
+def compose_score(bpm, chord1, chord2, scale_notes, structure=SONG_STRUCTURE, sample_rate=SAMPLE_RATE,
+                  rng=random):
+    """The whole arrangement as one score. Returns (score, total_samples)."""
+    bars = [events for _, events in compose_bars(bpm, chord1, chord2, scale_notes, structure, sample_rate, rng)]
+    return np.concatenate(bars), bar_start(len(structure), bpm, sample_rate)
+
+def save_score(path, score, total_samples, sample_rate=SAMPLE_RATE):
+    np.savez(path, score=score, total_samples=total_samples, sample_rate=sample_rate)
+
+def load_score(path, sample_rate=None):
+    """Loads a saved score, retimed to sample_rate if given. Returns (score, total_samples, sample_rate)."""
+    with np.load(path) as data:
+        score = data["score"]
+        total_samples = int(data["total_samples"])
+        score_rate = int(data["sample_rate"])
+    if sample_rate and sample_rate != score_rate:
+        score = score.copy()
+        score["start"] = np.round(score["start"] * sample_rate / score_rate).astype(np.int64)
+        total_samples = int(round(total_samples * sample_rate / score_rate))
+        score_rate = sample_rate
+    return score, total_samples, score_rate
+
+# --- 6. THE MIXING DESK (Phase 2: render the score) ---
+# Events that share a voice (same drum, same note at the same length) share one cached waveform.
+# Each event is then a plain slice add: a few hundred of those beat any scatter (np.add.at) or
+# impulse-train convolution over the whole track by one to two orders of magnitude.
+
+def overlap_add(master, waves, starts, vols):
+    """
+    Adds vols[i] * waves (or waves[i] for per-event waves) at every starts[i].
+    Overlapping events sum correctly, and anything past the end of master is cut off.
+    """
+    profiling.count("mix_batches")
+    keep = (starts >= 0) & (starts < len(master))
+    starts, vols = starts[keep], vols[keep]
+    profiling.count("mix_calls", len(starts))
+    if waves.ndim == 2:
+        waves = waves[keep]
+
+    for i, (start, vol) in enumerate(zip(starts.tolist(), vols.tolist())):
+        wave = waves[i] if waves.ndim == 2 else waves
+        end = min(start + len(wave), len(master))
+        master[start:end] += vol * wave[:end - start]
+
+def voices(events, fields):
+    """Groups events by identical values in fields. Yields (values, events in that group)."""
+    if not len(events):
+        return
+    keys = np.column_stack([events[f].astype(np.float64) for f in fields])
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    for group, values in enumerate(unique):
+        yield values, events[inverse == group]
+
+def synth_drums(sample_rate=SAMPLE_RATE, rng=np.random):
+    """Each drum is one fixed sample for the whole track."""
+    return {drum: synth(sample_rate, rng) for drum, synth in DRUM_SYNTHS.items()}
+
+def mix_events(master, events, drum_samples, sample_rate=SAMPLE_RATE, rng=np.random):
+    """
+    Adds events into master, where each event's start is a sample offset into master.
+    rng supplies the sax breath noise.
+    """
+    instrument = events["instrument"]
+
+    # Drums: one fixed sample per drum
+    for drum, sample in drum_samples.items():
+        hits = events[instrument == drum]
+        overlap_add(master, sample, hits["start"], hits["vol"].astype(np.float64))
+
+    # Keys: one waveform per (pitch, length, drift phase)
+    for (f, dur, phase_step), notes in voices(events[instrument == KEYS], ("freq", "dur", "phase")):
+        carrier, env = keys_waves(f, dur, int(phase_step), sample_rate)
+        overlap_add(master, carrier * env, notes["start"], notes["vol"].astype(np.float64))
+
+    # Sax: one tone per (pitch, length), plus fresh breath noise for every note
+    for (freq, dur), notes in voices(events[instrument == SAX], ("freq", "dur")):
+        tone, env = sax_waves(freq, dur, sample_rate)
+        vols = notes["vol"].astype(np.float64)
+        overlap_add(master, tone, notes["start"], vols)
+        breath = rng.uniform(-0.05, 0.05, (len(notes), len(env))) * env
+        overlap_add(master, breath, notes["start"], vols)
+
+def render_score(score, total_samples, sample_rate=SAMPLE_RATE, rng=np.random):
+    """rng supplies the noise (snare, hats, sax breath)."""
+    drum_samples = synth_drums(sample_rate, rng)
+    master = np.zeros(total_samples)
+    mix_events(master, score, drum_samples, sample_rate, rng)
+    return master
+
+# -- Stems --
+# Drums, keys and sax never touch each other until the final sum, so each group can render
+# in its own process straight into a memory-mapped float32 stem (see stems.py).
+STEM_GROUPS = {"drums": (KICK, SNARE, HAT), "keys": (KEYS,), "sax": (SAX,)}
+
+@profiling.profiled("stem")
+def render_stem(path, group, score, seed, sample_rate=SAMPLE_RATE):
+    """Mixes one instrument group into its stem file. Safe to run in a worker process."""
+    # Each group draws noise from its own stream, so stems don't depend on which process ran first
+    rng = np.random.default_rng([seed, list(STEM_GROUPS).index(group)])
+    members = STEM_GROUPS[group]
+    drum_samples = {drum: sample for drum, sample in synth_drums(sample_rate, rng).items() if drum in members} \
+        if group == "drums" else {}
+
+    stem = np.lib.format.open_memmap(path, mode="r+")
+    mix_events(stem, score[np.isin(score["instrument"], members)], drum_samples, sample_rate, rng)
+    stem.flush()
+    return group
+
+def render_stems(wav_path, score, total_samples, seed, workers=len(STEM_GROUPS), sample_rate=SAMPLE_RATE):
+    """Renders every group's stem, in parallel when workers > 1. Returns {group: path}."""
+    paths = create_stems(wav_path, STEM_GROUPS, total_samples, sample_rate)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(STEM_GROUPS))) as pool:
+            for future in [pool.submit(render_stem, path, group, score, seed, sample_rate)
+                           for group, path in paths.items()]:
+                future.result()
+    else:
+        for group, path in paths.items():
+            render_stem(path, group, score, seed, sample_rate)
+    return paths
+
+# -- Streaming --
+# For long sets the mix is never held in full: a rolling buffer only spans one block plus the
+# longest voice tail, and finished blocks go straight to disk.
+STREAM_MAX_GAIN = 0.42           # Typical tracks peak around 2.3 before normalization
+STREAM_CEILING = 0.95            # Same headroom as write_track's normalization
+STREAM_RELEASE_PER_SECOND = 1.1  # How fast the limiter lets the gain come back up
+STREAM_AUTO_MINUTES = 10         # Longer arrangements always stream
+
+class StreamingRenderer:
+    """
+    Renders score events block by block. Events may be added early (sax licks can start bars
+    after the bar that played them); each is mixed in once its start falls inside the next block.
+    """
+    def __init__(self, max_block, max_tail, drum_samples, sample_rate=SAMPLE_RATE, rng=np.random):
+        self.buffer = np.zeros(max_block + max_tail)
+        self.max_block = max_block
+        self.position = 0 # Absolute sample index of buffer[0]
+        self.pending = np.zeros(0, dtype=SCORE_DTYPE)
+        self.drum_samples = drum_samples
+        self.sample_rate = sample_rate
+        self.rng = rng
+
+    def add(self, events):
+        self.pending = np.concatenate([self.pending, events])
+
+    def render(self, num_samples):
+        """Returns the next num_samples of the mix. Every event starting before them must be added."""
+        if num_samples > self.max_block:
+            raise ValueError(f"Block of {num_samples} samples is larger than the buffer's {self.max_block}")
+        due = self.pending["start"] < self.position + num_samples
+        if due.any():
+            events = self.pending[due].copy()
+            events["start"] -= self.position
+            mix_events(self.buffer, events, self.drum_samples, self.sample_rate, self.rng)
+            self.pending = self.pending[~due]
+
+        block = self.buffer[:num_samples].copy()
+        self.buffer[:-num_samples] = self.buffer[num_samples:]
+        self.buffer[-num_samples:] = 0
+        self.position += num_samples
+        return block
+
+class BlockLimiter:
+    """
+    Replaces the global peak normalization when the whole mix is never in memory.
+    Looks one block ahead, so the gain is already down before a peak arrives (no overshoot),
+    and ramps within each block so gain changes don't click.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, max_gain=STREAM_MAX_GAIN, ceiling=STREAM_CEILING):
+        self.sample_rate = sample_rate
+        self.max_gain = max_gain
+        self.ceiling = ceiling
+        self.gain = None
+
+    def process(self, block, next_peak):
+        peak = np.max(np.abs(block)) if len(block) else 0.0
+        if self.gain is None:
+            self.gain = min(self.max_gain, self.ceiling / max(peak, 1e-12))
+        release = STREAM_RELEASE_PER_SECOND ** (len(block) / self.sample_rate)
+        target = min(self.max_gain, self.gain * release,
+                     self.ceiling / max(peak, 1e-12), self.ceiling / max(next_peak, 1e-12))
+        out = block * np.linspace(self.gain, target, len(block))
+        self.gain = target
+        return out
+
+# --- 7. VISUALIZER SIDECAR ---
+# video.py paints from loudness and brightness. The renderer already sees every block of the mix,
+# so we measure both on the way out instead of making video.py re-read the finished WAV.
+SIDECAR_HOP_SECONDS = 512 / 22050 # Same time resolution as video.py's own analysis
+SIDECAR_FFT_SECONDS = 2048 / 22050 # Same window as librosa's spectral centroid
+SIDECAR_FFT_BATCH = 256 # Centroid frames per rfft call
+
+SIDECAR_EVENT_DTYPE = np.dtype([("kind", "U5"), ("start", "f8"), ("length", "f8"), ("freq", "f4"), ("vol", "f4")])
+
+def sidecar_path(wav_path):
+    return os.path.splitext(wav_path)[0] + ".features.npz"
+
+class SidecarRecorder:
+    """
+    Builds the sidecar incrementally: events as they are composed, audio as it is rendered.
+    Memory is a few numbers per hop, so it works for streamed hour-long sets too.
+    """
+    def __init__(self, total_samples, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.hop = int(round(SIDECAR_HOP_SECONDS * sample_rate))
+        self.num_hops = total_samples // self.hop
+        self.rms = np.zeros(self.num_hops, dtype=np.float32)
+        self.rms_hops = 0
+        self.leftover = np.zeros(0)
+        self.events = []
+
+        # Spectral centroid: a Hann-windowed frame of n_fft samples centred on each hop
+        self.n_fft = int(round(SIDECAR_FFT_SECONDS * sample_rate))
+        self.window = np.hanning(self.n_fft)
+        self.bin_freqs = np.fft.rfftfreq(self.n_fft, 1 / sample_rate)
+        self.centroid = np.zeros(self.num_hops, dtype=np.float32)
+        self.centroid_hops = 0
+        self.tail_start = -(self.n_fft // 2) # Absolute sample index of tail[0]; before the track is silence
+        self.tail = np.zeros(self.n_fft // 2)
+
+    def add_events(self, score):
+        """The note timeline, for anything that wants to follow the score (brightness comes from the audio)."""
+        events = np.empty(len(score), dtype=SIDECAR_EVENT_DTYPE)
+        events["kind"] = np.array(INSTRUMENTS)[score["instrument"]]
+        events["start"] = score["start"] / self.sample_rate
+        events["length"] = score["dur"]
+        events["freq"] = score["freq"]
+        events["vol"] = score["vol"]
+        self.events.append(events)
+
+    def add_audio(self, block):
+        """RMS and spectral centroid per hop from the finished mix; blocks don't need to line up with hops."""
+        samples = np.concatenate([self.leftover, block])
+        num_hops = min(len(samples) // self.hop, self.num_hops - self.rms_hops)
+        frames = samples[:num_hops * self.hop].reshape(num_hops, self.hop)
+        self.rms[self.rms_hops:self.rms_hops + num_hops] = np.sqrt(np.mean(frames ** 2, axis=1))
+        self.rms_hops += num_hops
+        self.leftover = samples[num_hops * self.hop:]
+        self.add_centroid_audio(block)
+
+    def add_centroid_audio(self, block):
+        """Computes every centroid frame whose window is now complete and keeps the rest for later."""
+        self.tail = np.concatenate([self.tail, block])
+        while self.centroid_hops < self.num_hops:
+            # Frame i covers [centre - n_fft/2, centre + n_fft/2), centre = middle of hop i
+            first = self.centroid_hops * self.hop + self.hop // 2 - self.n_fft // 2 - self.tail_start
+            available = (len(self.tail) - first - self.n_fft) // self.hop + 1
+            count = min(available, SIDECAR_FFT_BATCH, self.num_hops - self.centroid_hops)
+            if count <= 0:
+                break
+            frames = np.lib.stride_tricks.sliding_window_view(self.tail[first:], self.n_fft)[::self.hop][:count]
+            spectrum = np.abs(np.fft.rfft(frames * self.window, axis=1))
+            total = spectrum.sum(axis=1)
+            self.centroid[self.centroid_hops:self.centroid_hops + count] = np.divide(
+                spectrum @ self.bin_freqs, total, out=np.zeros(count), where=total > 1e-10)
+            self.centroid_hops += count
+        # Drop what no remaining frame needs
+        keep_from = max(0, self.centroid_hops * self.hop + self.hop // 2 - self.n_fft // 2 - self.tail_start)
+        self.tail = self.tail[keep_from:]
+        self.tail_start += keep_from
+
+    def write(self, path):
+        # Frames that reach past the end of the track see silence there
+        self.add_centroid_audio(np.zeros(self.n_fft))
+        centroid = self.centroid
+        events = np.concatenate(self.events) if self.events else np.zeros(0, dtype=SIDECAR_EVENT_DTYPE)
+
+        np.savez(path, rms=self.rms, centroid=centroid.astype(np.float32),
+                 duration=self.num_hops * self.hop / self.sample_rate, hop_seconds=self.hop / self.sample_rate,
+                 events=events)
+
+def write_sidecar(path, score, master, sample_rate=SAMPLE_RATE):
+    """Saves RMS and spectral centroid per hop (from the finished mix) and the event timeline as .npz."""
+    recorder = SidecarRecorder(len(master), sample_rate)
+    recorder.add_events(score)
+    recorder.add_audio(master)
+    recorder.write(path)
 
-    # Finalize
-    master = master[:total_samples]
-    max_val = np.max(np.abs(master))
-    if max_val > 0: master = master / max_val * 0.95
+# --- 8. RENDER CACHE ---
+# Same seed + same sheet music + same synth = the same track, bit for bit (see make_rngs).
+# So every finished render is kept under a hash of exactly those, and asking for it again is a file copy.
+SYNTH_VERSION = 5 # Bump whenever a change alters what a given seed sounds like
+RENDER_CACHE_DIR = os.path.join(CACHE_DIR, "renders")
+RENDER_CACHE_BYTES = 2 * 1024**3
+
+def render_cache_key(seed, params, options, sample_rate=SAMPLE_RATE):
+    """options: the render settings that change the audio (length, streaming, format, stems)."""
+    blob = json.dumps({"seed": seed, "params": params, "sample_rate": sample_rate,
+                       "synth": SYNTH_VERSION, "options": options}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()[:32]
+
+def session_path(wav_path):
+    return os.path.splitext(wav_path)[0] + ".session.json"
+
+def render_outputs(filename, stems=False):
+    """Every file a render leaves behind."""
+    paths = [filename, sidecar_path(filename), score_path(filename), session_path(filename)]
+    if stems:
+        paths += [stems_manifest_path(filename)] + [stem_path(filename, group) for group in STEM_GROUPS]
+    return paths
+
+def cached_render_files(entry, outputs):
+    return [os.path.join(entry, os.path.basename(path)) for path in outputs]
+
+def cached_render_complete(entry, outputs):
+    return all(os.path.exists(path) for path in cached_render_files(entry, outputs))
+
+def load_cached_render(key, filename, stems=False):
+    """Copies a cached render's files to where this render would have written them. False on a miss."""
+    if not RENDER_CACHE_DIR:
+        return False
+    entry = os.path.join(RENDER_CACHE_DIR, key)
+    outputs = render_outputs(filename, stems)
+    cached = cached_render_files(entry, outputs)
+    if not all(os.path.exists(path) for path in cached):
+        # Entries only ever appear whole, so a partial one is debris (e.g. an interrupted eviction):
+        # clear it so this render can store a good copy
+        shutil.rmtree(entry, ignore_errors=True)
+        return False
+    # Copies, not links: a later render to the same path would otherwise overwrite the cache through the link
+    try:
+        for src, dst in zip(cached, outputs):
+            shutil.copyfile(src, dst)
+        os.utime(entry) # Recently used, so evicted last
+    except OSError:
+        return False # Another worker evicted the entry mid-copy: render it, overwriting the partial copy
+    return True
+
+def store_cached_render(key, filename, stems=False):
+    if not RENDER_CACHE_DIR:
+        return
+    os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
+    entry = os.path.join(RENDER_CACHE_DIR, key)
+    # Fill a temp dir then rename, so a crash never leaves a half-copied entry behind
+    tmp_entry = f"{entry}.{os.getpid()}.tmp"
+    os.makedirs(tmp_entry, exist_ok=True)
+    outputs = render_outputs(filename, stems)
+    for path in outputs:
+        shutil.copyfile(path, os.path.join(tmp_entry, os.path.basename(path)))
+    for attempt in range(2):
+        try:
+            os.replace(tmp_entry, entry)
+            break
+        except OSError:
+            if attempt or cached_render_complete(entry, outputs):
+                shutil.rmtree(tmp_entry, ignore_errors=True) # Another worker cached the same render first
+                break
+            shutil.rmtree(entry, ignore_errors=True) # A broken leftover is in the way: replace it
+    evict_render_cache()
+
+def evict_render_cache(max_bytes=None):
+    """Deletes the least recently used renders until the cache fits in max_bytes (default RENDER_CACHE_BYTES)."""
+    max_bytes = RENDER_CACHE_BYTES if max_bytes is None else max_bytes
+    entries = []
+    # Batch workers evict concurrently, so any entry may vanish under us: skip it, it's gone either way
+    for name in os.listdir(RENDER_CACHE_DIR):
+        entry = os.path.join(RENDER_CACHE_DIR, name)
+        if ".tmp" in name:
+            continue
+        try:
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            entries.append((os.stat(entry).st_mtime, size, entry))
+        except OSError:
+            continue
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+# --- MAIN ENGINE ---
+def write_track(filename, master, sample_rate=SAMPLE_RATE):
+    """Normalizes to just under full scale and saves 16-bit PCM. Returns the normalized mix."""
+    with profiling.span("normalize"):
+        max_val = np.max(np.abs(master))
+        if max_val > 0: master = master / max_val * 0.95
+    with profiling.span("write_wav"):
+        wavfile.write(filename, sample_rate, (master * 32767).astype(np.int16))
+    return master
+
+def arrangement_bars(bpm, bars=None, minutes=None):
+    """How many bars to play: explicit, enough to fill `minutes`, or the standard song."""
+    if minutes:
+        return max(8, int(np.ceil(minutes * 60 / (240 / bpm))))
+    return bars
+
+@profiling.profiled()
+def render_track(seed, params, out_dir="", bars=None, minutes=None, stream=False, wav_format="int16",
+                 stems=False, stem_workers=len(STEM_GROUPS), cache=True):
+    """
+    Composes and renders one track from its seed and sheet music. Safe to run in a worker process.
+    cache=False neither reads nor writes the render cache.
+    """
+    note_rng, noise_rng = make_rngs(seed)
+    bpm, root, intervals, chord1, chord2 = read_session(params)
+    structure = build_structure(arrangement_bars(bpm, bars, minutes))
+    print(f"[{seed}] BPM: {bpm} | Key: {root:.1f}Hz")
 
-    filename = f"Soul_Improv_{seed}.wav"
-    wavfile.write(filename, SAMPLE_RATE, (master * 32767).astype(np.int16))
+    scale_notes = get_scale_notes(root, intervals)
+    filename = os.path.join(out_dir, f"Soul_Improv_{seed}.wav")
+    duration = bar_start(len(structure), bpm) / SAMPLE_RATE
+    profiling.current().audio_seconds = duration
+    cache_key = render_cache_key(seed, params, {"bars": len(structure), "stream": stream,
+                                                "wav_format": wav_format, "stems": stems})
+    cached = cache and load_cached_render(cache_key, filename, stems)
+    if cached:
+        profiling.count("render_cache_hits")
+        print(f"[{seed}] Already rendered this exact track: copied from the render cache")
+    # Stems live on disk already, so they never need the streaming path
+    elif stream or (not stems and len(structure) * 240 / bpm > STREAM_AUTO_MINUTES * 60):
+        with profiling.span("stream", audio_seconds=duration):
+            stream_track(filename, bpm, chord1, chord2, scale_notes, structure, note_rng, noise_rng, wav_format)
+    else:
+        # Write the score: structure, drums, chords and the improvised sax, as data
+        with profiling.span("compose"):
+            score, total_samples = compose_score(bpm, chord1, chord2, scale_notes, structure, rng=note_rng)
+        
+        # Play it
+        print(f"[{seed}] Improvising over {len(structure)} bars ({len(score)} events)...")
+        if stems:
+            with profiling.span("stems", audio_seconds=duration):
+                render_stems(filename, score, total_samples, seed, stem_workers)
+            with profiling.span("mixdown", audio_seconds=duration):
+                _, stem_audio = load_stems(filename)
+                sidecar = SidecarRecorder(total_samples)
+                sidecar.add_events(score)
+                write_mixdown(filename, stem_audio, SAMPLE_RATE, wav_format=wav_format, on_block=sidecar.add_audio)
+                sidecar.write(sidecar_path(filename))
+        else:
+            with profiling.span("synthesis", audio_seconds=duration):
+                master = render_score(score, total_samples, rng=noise_rng)
+
+            # Finalize
+            master = write_track(filename, master)
+            with profiling.span("sidecar"):
+                write_sidecar(sidecar_path(filename), score, master)
+        save_score(score_path(filename), score, total_samples)
+
+    if not cached:
+        with open(session_path(filename), "w") as f:
+            json.dump(params, f, indent=2) # Replay with: --seed <seed> --params <this file>
+        if cache:
+            store_cached_render(cache_key, filename, stems)
+
+    # Catalogue it, so mic.py and video.py can find it by seed, tempo or key
+    sidecars = {"features": sidecar_path(filename), "score": score_path(filename), "session": session_path(filename)}
+    if stems:
+        sidecars["stems"] = stems_manifest_path(filename)
+    try:
+        with profiling.span("library"):
+            register_track(filename, seed, params, bpm, root, duration, SAMPLE_RATE, sidecars)
+    except sqlite3.Error as e:
+        print(f"[{seed}] Couldn't add the track to the library ({e})")
+    return filename
+
+def play_bars(bpm, chord1, chord2, scale_notes, structure, note_rng, noise_rng, on_events=None):
+    """
+    Composes, renders and limits bar by bar. Yields (block, seconds spent rendering it).
+    The structure may be endless. on_events(events) sees each bar's score as it is written.
+    """
+    bar_len = bar_start(1, bpm) + 1
+    renderer = StreamingRenderer(bar_len, bar_len, synth_drums(SAMPLE_RATE, noise_rng), SAMPLE_RATE, noise_rng)
+    limiter = BlockLimiter()
+
+    # The limiter looks one bar ahead, so each bar goes out once the next one is rendered
+    held = None
+    start = time.perf_counter()
+    for bar_idx, events in compose_bars(bpm, chord1, chord2, scale_notes, structure, rng=note_rng):
+        renderer.add(events)
+        if on_events:
+            on_events(events)
+
+        block = renderer.render(bar_start(bar_idx + 1, bpm) - renderer.position)
+        if held is not None:
+            yield limiter.process(held, np.max(np.abs(block))), time.perf_counter() - start
+            start = time.perf_counter()
+        held = block
+    if held is not None:
+        yield limiter.process(held, 0.0), time.perf_counter() - start
+
+def stream_track(filename, bpm, chord1, chord2, scale_notes, structure, note_rng, noise_rng, wav_format="int16"):
+    """
+    Composes and renders bar by bar, writing each finished bar straight to the WAV.
+    Peak memory is a couple of bars of audio, however long the arrangement.
+    """
+    total_samples = bar_start(len(structure), bpm)
+    sidecar = SidecarRecorder(total_samples)
+    score_parts = []
+
+    def on_events(events):
+        sidecar.add_events(events)
+        score_parts.append(events)
+
+    print(f"Streaming {len(structure)} bars ({total_samples / SAMPLE_RATE / 60:.1f} min) to {filename}...")
+    with StreamingWavWriter(filename, SAMPLE_RATE, dtype=wav_format) as wav:
+        for block, _ in play_bars(bpm, chord1, chord2, scale_notes, structure, note_rng, noise_rng, on_events):
+            wav.write(block)
+            sidecar.add_audio(block)
+
+    sidecar.write(sidecar_path(filename))
+    save_score(score_path(filename), np.concatenate(score_parts), total_samples)
+    return filename
+
+def generate_soul_track(provider=None, seed=None, params=None, **render_options):
+    """With both seed and params given, replays that exact track: no quantum bytes, no bandleader."""
+    provider = provider or GeminiProvider()
+    if params is None and provider.name == "gemini" and GOOGLE_API_KEY == "myapikey":
+        print("ERROR: Paste API Key")
+        return
+
+    # The seed comes from banked quantum bytes, so it's ready at once.
+    # Meanwhile the bank refills in the background while we wait on the bandleader.
+    if seed is None:
+        seed = get_quantum_seed()
+    
+    # 1. Ask the bandleader for the "Vibe" (Scale & Chords)
+    if params is None:
+        params = fetch_session(provider, seed)
+
+    # 2. Compose and play
+    filename = render_track(seed, params, **render_options)
+    if WAVE_CACHE.hits or WAVE_CACHE.misses:
+        print(f"Synth cache: {WAVE_CACHE.hits} notes reused, {WAVE_CACHE.misses} synthesized")
     print(f"DONE. Soul captured in: {filename}")
 
+# --- BATCH MODE ---
+# Hundreds of candidate tracks overnight: sheet music is fetched up front, then a process pool renders.
+# Every track carries its own RNGs (see make_rngs), so results don't depend on which worker ran them.
+SESSION_REQUESTS_IN_FLIGHT = 8
+
+def generate_batch(seeds, provider, workers=1, out_dir=".", **render_options):
+    os.makedirs(out_dir or ".", exist_ok=True)
+    # Ask for several tracks' sheet music at once; each request has its own budget and fallback
+    with ThreadPoolExecutor(max_workers=SESSION_REQUESTS_IN_FLIGHT) as pool:
+        jobs = list(zip(seeds, pool.map(lambda seed: fetch_session(provider, seed), seeds)))
+
+    print(f"Rendering {len(jobs)} tracks on {workers} worker{'s' if workers > 1 else ''}...")
+    start = time.perf_counter()
+    done = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_track, seed, params, out_dir, **render_options): seed for seed, params in jobs}
+        for future in as_completed(futures):
+            try:
+                done.append(future.result())
+                print(f"DONE. Soul captured in: {done[-1]}")
+            except Exception as e:
+                print(f"[{futures[future]}] Render failed: {e}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Batch finished: {len(done)}/{len(jobs)} tracks in {elapsed:.1f}s")
+    return done
+
+# --- LIVE MODE ---
+# Endless "radio": a producer thread renders a couple of bars ahead into a ring buffer,
+# and the sound card's callback pulls from it. Nothing is written to disk.
+LIVE_LOOKAHEAD_BARS = 2
+LIVE_BLOCK = 1024         # Frames per audio callback
+LIVE_REPORT_BARS = 16     # Print render stats this often
+
+def endless_structure():
+    yield from ["Intro"]*4
+    while True:
+        yield from ["Verse"]*16 + ["Chorus"]*8 + ["Verse"]*8
+
+class AudioRing:
+    """
+    Single-producer, single-consumer ring of float32 samples.
+    read_into never blocks (it runs in the audio callback); missing samples play as silence
+    and count as an underrun once playback has started.
+    """
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.read_pos = 0
+        self.write_pos = 0 # Both positions only grow; index with % capacity
+        self.cond = threading.Condition()
+        self.started_at = None
+        self.first_audio_at = None
+        self.closed = False # Set once the producer has written its last block
+        self.underruns = 0
+        self.underrun_frames = 0
+
+    def write(self, block, stop):
+        """Blocks until there is room (or stop is set). Returns False if stopped."""
+        capacity = len(self.data)
+        for chunk_start in range(0, len(block), capacity):
+            chunk = block[chunk_start:chunk_start + capacity]
+            with self.cond:
+                while self.write_pos + len(chunk) - self.read_pos > capacity and not stop.is_set():
+                    self.cond.wait(0.1)
+                if stop.is_set():
+                    return False
+            i = self.write_pos % capacity
+            first = min(len(chunk), capacity - i)
+            self.data[i:i + first] = chunk[:first]
+            self.data[:len(chunk) - first] = chunk[first:]
+            with self.cond:
+                self.write_pos += len(chunk)
+        return True
+
+    def read_into(self, out):
+        with self.cond:
+            available = min(len(out), self.write_pos - self.read_pos)
+            i = self.read_pos % len(self.data)
+            first = min(available, len(self.data) - i)
+            out[:first] = self.data[i:i + first]
+            out[first:available] = self.data[:available - first]
+            out[available:] = 0
+            self.read_pos += available
+            if available and self.first_audio_at is None:
+                self.first_audio_at = time.perf_counter()
+            if available < len(out) and self.first_audio_at is not None and not self.closed:
+                self.underruns += 1
+                self.underrun_frames += len(out) - available
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+
+    def buffered(self):
+        with self.cond:
+            return self.write_pos - self.read_pos
+
+class SoundDeviceSink:
+    """Plays through the default output device."""
+    def __init__(self, sample_rate, blocksize, callback):
+        import sounddevice as sd # Only live mode needs a sound card
+        self.stream = sd.OutputStream(samplerate=sample_rate, blocksize=blocksize, channels=1,
+                                      dtype="float32", callback=callback)
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.stop()
+        self.stream.close()
+
+class NullSink:
+    """
+    Stands in for a sound card: calls the callback from its own thread, paced like a real device.
+    speed > 1 drains faster than real time, to test a machine's headroom quickly.
+    """
+    def __init__(self, sample_rate, blocksize, callback, speed=1.0):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.speed = speed
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        out = np.zeros((self.blocksize, 1), dtype=np.float32)
+        period = self.blocksize / self.sample_rate / self.speed
+        deadline = time.perf_counter()
+        while not self.stop_event.is_set():
+            self.callback(out, self.blocksize, None, None)
+            deadline += period
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+SINKS = {"sounddevice": SoundDeviceSink, "null": NullSink}
+
+def report_live(ring, render_times, bar_seconds):
+    worst = max(render_times)
+    print(f"[live] {len(render_times)} bars | render avg {np.mean(render_times) * 1000:.1f}ms, "
+          f"worst {worst * 1000:.1f}ms of {bar_seconds * 1000:.0f}ms ({bar_seconds / worst:.0f}x headroom) | "
+          f"buffered {ring.buffered() / SAMPLE_RATE:.1f}s | underruns {ring.underruns} "
+          f"({ring.underrun_frames / SAMPLE_RATE * 1000:.0f}ms silent)")
+
+def play_live(seed, params, sink="sounddevice", bars=None, lookahead_bars=LIVE_LOOKAHEAD_BARS, speed=1.0):
+    """Improvises until Ctrl+C (or for `bars` bars), playing each bar as soon as it is rendered."""
+    note_rng, noise_rng = make_rngs(seed)
+    bpm, root, intervals, chord1, chord2 = read_session(params)
+    scale_notes = get_scale_notes(root, intervals)
+    structure = build_structure(bars) if bars else endless_structure()
+    bar_seconds = 240 / bpm
+    print(f"[{seed}] LIVE | BPM: {bpm} | Key: {root:.1f}Hz | {lookahead_bars} bars of lookahead")
+
+    ring = AudioRing(int(lookahead_bars * bar_seconds * SAMPLE_RATE) + 1)
+    stop = threading.Event()
+    render_times = []
+
+    def produce():
+        for block, seconds in play_bars(bpm, chord1, chord2, scale_notes, structure, note_rng, noise_rng):
+            render_times.append(seconds)
+            profiling.count("bars_rendered")
+            if len(render_times) % LIVE_REPORT_BARS == 0:
+                report_live(ring, render_times, bar_seconds)
+            if not ring.write(block.astype(np.float32), stop):
+                return
+        ring.close()
+
+    def callback(outdata, frames, time_info, status):
+        ring.read_into(outdata[:, 0])
+
+    producer = threading.Thread(target=produce, daemon=True)
+    output = SINKS[sink](SAMPLE_RATE, LIVE_BLOCK, callback, **({"speed": speed} if sink == "null" else {}))
+    ring.started_at = time.perf_counter()
+    with profiling.span("live") as live_span:
+        producer.start()
+        output.start()
+        try:
+            # Finite sets end once the last bar has drained
+            while producer.is_alive() or ring.buffered() > 0:
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            print("\n[live] Stopping...")
+        finally:
+            stop.set()
+            output.stop()
+            producer.join()
+        live_span.audio_seconds = ring.read_pos / SAMPLE_RATE
+    profiling.count("underruns", ring.underruns)
+    profiling.count("dropped_frames", ring.underrun_frames)
+
+    if ring.first_audio_at is not None:
+        print(f"[live] First audio after {(ring.first_audio_at - ring.started_at) * 1000:.0f}ms")
+    if render_times:
+        report_live(ring, render_times, bar_seconds)
+
+def generate_live(provider=None, sink="sounddevice", bars=None, lookahead_bars=LIVE_LOOKAHEAD_BARS, speed=1.0):
+    provider = provider or GeminiProvider()
+    if provider.name == "gemini" and GOOGLE_API_KEY == "myapikey":
+        print("ERROR: Paste API Key")
+        return
+    seed = get_quantum_seed()
+    play_live(seed, fetch_session(provider, seed), sink, bars, lookahead_bars, speed)
+
+def score_path(wav_path):
+    return os.path.splitext(wav_path)[0] + ".score.npz"
+
+def rerender_score(path, sample_rate=SAMPLE_RATE):
+    """Plays a saved score again, optionally at another sample rate."""
+    score, total_samples, sample_rate = load_score(path, sample_rate)
+    print(f"Re-rendering {len(score)} events at {sample_rate}Hz...")
+    master = render_score(score, total_samples, sample_rate)
+
+    base = os.path.splitext(os.path.splitext(path)[0])[0]
+    filename = f"{base}_{sample_rate}Hz.wav"
+    write_track(filename, master, sample_rate)
+    print(f"DONE. Soul captured in: {filename}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="The Seducer's band: writes and plays a soul track.")
+    parser.add_argument("--score", help="Re-render a saved .score.npz instead of writing a new track")
+    parser.add_argument("--rate", type=int, default=SAMPLE_RATE, help="Sample rate for --score")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="gemini",
+                        help="Who writes the sheet music: the Gemini bandleader or the offline stand-in")
+    parser.add_argument("--count", type=int, help="Batch mode: render N tracks with fresh seeds")
+    parser.add_argument("--seeds", type=int, nargs="+", help="Batch mode: render these seeds")
+    parser.add_argument("--seed", type=int, help="Render this seed instead of a quantum one")
+    parser.add_argument("--params", help="Sheet music JSON (e.g. a render's .session.json); with --seed, replays it")
+    parser.add_argument("--no-cache", action="store_true", help="Always render, even if this exact track is cached")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for batch mode")
+    parser.add_argument("--out-dir", default=".", help="Where batch renders go")
+    parser.add_argument("--bars", type=int, help="Arrangement length in bars (default: the 40-bar song)")
+    parser.add_argument("--minutes", type=float, help="Arrangement length in minutes")
+    parser.add_argument("--stream", action="store_true",
+                        help=f"Render in constant memory, bar by bar (automatic past {STREAM_AUTO_MINUTES} minutes)")
+    parser.add_argument("--wav-format", choices=["int16", "float32"], default="int16",
+                        help="Sample type for streamed WAVs")
+    parser.add_argument("--stems", action="store_true",
+                        help="Render drums, keys and sax in parallel and keep each as a stem for remixing in mic.py")
+    parser.add_argument("--live", action="store_true", help="Play endlessly through the sound card instead of rendering")
+    parser.add_argument("--sink", choices=sorted(SINKS), default="sounddevice",
+                        help="Live output; 'null' plays into nothing, for testing without a sound card")
+    parser.add_argument("--lookahead", type=float, default=LIVE_LOOKAHEAD_BARS, help="Bars rendered ahead in live mode")
+    parser.add_argument("--speed", type=float, default=1.0, help="How fast the null sink drains, vs. real time")
+    parser.add_argument("--profile", nargs="?", const="", metavar="OUT",
+                        help="Time every stage; OUT.trace.json saves a Chrome trace, other .json paths plain JSON")
+    args = parser.parse_args()
+    if args.stems and args.stream:
+        parser.error("--stems already renders to disk; drop --stream")
+    return args
+
 if __name__ == "__main__":
-    generate_soul_track()
+    args = parse_args()
+    if args.profile is not None:
+        profiling.enable(args.profile or None)
+    provider = PROVIDERS[args.provider]()
+    # Passed down explicitly: batch workers started with spawn don't see module globals set here
+    render_options = dict(bars=args.bars, minutes=args.minutes, stream=args.stream, wav_format=args.wav_format,
+                          stems=args.stems, cache=not args.no_cache)
+    if args.score:
+        rerender_score(args.score, args.rate)
+    elif args.live:
+        generate_live(provider, args.sink, args.bars, args.lookahead, args.speed)
+    elif args.count or args.seeds:
+        seeds = args.seeds or [secrets.randbits(32) for _ in range(args.count)]
+        # The batch pool already has every core busy, so stems render serially inside each worker
+        generate_batch(seeds, provider, args.workers, args.out_dir, stem_workers=1, **render_options)
+    else:
+        params = None
+        if args.params:
+            with open(args.params) as f:
+                params = json.load(f)
+        generate_soul_track(provider, args.seed, params, **render_options)
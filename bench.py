@@ -0,0 +1,294 @@
+import os
+import io
+import sys
+import json
+import time
+import atexit
+import shutil
+import timeit
+import argparse
+import platform
+import tempfile
+import contextlib
+
+# --- BENCHMARK SETUP ---
+# Runs on a plain Linux box: no screen, no sound card, no network.
+# Everything the scripts write (renders, caches, the track library) goes to a throwaway folder.
+BENCH_DIR = tempfile.mkdtemp(prefix="seducer-bench-")
+atexit.register(shutil.rmtree, BENCH_DIR, ignore_errors=True)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ["SEDUCER_CACHE"] = os.path.join(BENCH_DIR, "cache")
+os.environ["SEDUCER_FEATURE_CACHE"] = os.path.join(BENCH_DIR, "features")
+
+import numpy as np
+
+# Sheet music for the full-track benchmark, fixed so results only change when the code does
+BENCH_SEED = 1234
+BENCH_PARAMS = {
+    "bpm": 80,
+    "root_freq": 43.65,
+    "scale_intervals": [0, 3, 5, 7, 10],
+    "chord_1": [174.6, 207.65, 261.63, 311.13, 392.0],
+    "chord_2": [233.08, 293.66, 415.3, 523.25, 784.0],
+}
+VOCAL_SECONDS = 30
+AUDIO_SECONDS = 30
+
+BENCHMARKS = {} # name -> (setup, repeat, units)
+
+def benchmark(name, repeat=5, units=1):
+    """
+    Registers setup(), which does any untimed preparation and returns the function to time.
+    If one call does `units` of what the name promises (e.g. frames), results are per unit.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, repeat, units)
+        return setup
+    return register
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def fresh_wave_cache(app):
+    """Cold runs: synthesize every tone instead of hitting the waveform cache."""
+    app.WAVE_CACHE = app.WaveformCache()
+
+def synthetic_song(path, seconds=AUDIO_SECONDS, sample_rate=44100):
+    """A bass line, chords and noise bursts: enough movement for the analysis to chew on."""
+    import scipy.io.wavfile as wavfile
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    song = 0.4 * np.sin(2 * np.pi * 55 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 0.5 * t))
+    song += 0.2 * np.sin(2 * np.pi * 440 * t) * (np.sin(2 * np.pi * 1.3 * t) > 0)
+    song += 0.1 * np.random.default_rng(0).standard_normal(len(t)) * (np.sin(2 * np.pi * 2 * t) > 0.9)
+    wavfile.write(path, sample_rate, (song / np.max(np.abs(song)) * 0.9 * 32767).astype(np.int16))
+    return path
+
+def synthetic_vocals(seconds=VOCAL_SECONDS, sample_rate=44100):
+    """A sung-ish tone (vibrato + harmonics) over mic hiss."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    phase = 2 * np.pi * np.cumsum(180 + 4 * np.sin(2 * np.pi * 5 * t)) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8)) * 0.2
+    return (voice + 0.01 * np.random.default_rng(1).standard_normal(len(t))).astype(np.float32)
+
+# --- 1. THE BAND (app.py) ---
+@benchmark("app.synth_sax_soul")
+def bench_sax():
+    import app
+    def run():
+        fresh_wave_cache(app)
+        for freq in (196.0, 233.08, 261.63, 311.13):
+            app.synth_sax_soul(freq, 0.75)
+    return run
+
+@benchmark("app.synth_sax_soul_cached")
+def bench_sax_cached():
+    import app
+    app.synth_sax_soul(261.63, 0.75)
+    return lambda: app.synth_sax_soul(261.63, 0.75)
+
+@benchmark("app.synth_keys_drift")
+def bench_keys():
+    import app
+    def run():
+        fresh_wave_cache(app)
+        app.synth_keys_drift(BENCH_PARAMS["chord_1"], 3.0)
+    return run
+
+@benchmark("app.drums")
+def bench_drums():
+    import app
+    rng = np.random.default_rng(0)
+    def run():
+        app.synth_kick_thump()
+        app.synth_snare_rim(rng=rng)
+        app.synth_hat_soft(rng=rng)
+    return run
+
+@benchmark("app.overlap_add")
+def bench_mix():
+    import app
+    master = np.zeros(app.SAMPLE_RATE * 60)
+    sound = np.random.default_rng(0).uniform(-1, 1, app.SAMPLE_RATE)
+    starts = np.random.default_rng(1).integers(0, len(master), 200)
+    vols = np.full(len(starts), 0.5)
+    return lambda: app.overlap_add(master, sound, starts, vols) # 200 hits of a one-second sound
+
+@benchmark("app.render_score", repeat=3)
+def bench_render_score():
+    import app
+    import random
+    scale = app.get_scale_notes(BENCH_PARAMS["root_freq"], BENCH_PARAMS["scale_intervals"])
+    score, total_samples = app.compose_score(BENCH_PARAMS["bpm"], BENCH_PARAMS["chord_1"], BENCH_PARAMS["chord_2"],
+                                             scale, rng=random.Random(BENCH_SEED))
+    rng = np.random.default_rng(0)
+    def run():
+        fresh_wave_cache(app)
+        app.render_score(score, total_samples, rng=rng)
+    return run
+
+@benchmark("app.improvise_many")
+def bench_improvise():
+    import app
+    scale = app.get_scale_notes(BENCH_PARAMS["root_freq"], BENCH_PARAMS["scale_intervals"])
+    intensities = [app.SECTION_INTENSITY[section] for section in app.SONG_STRUCTURE]
+    return lambda: app.improvise_many(scale, intensities, range(1000)) # 1000 candidate arrangements
+
+@benchmark("app.generate_soul_track", repeat=3)
+def bench_track():
+    import app
+    out_dir = os.path.join(BENCH_DIR, "renders")
+    os.makedirs(out_dir, exist_ok=True)
+    provider = app.LocalProvider()
+    def run():
+        fresh_wave_cache(app)
+        with quiet(): # cache=False: time the synthesis, not a file copy
+            app.generate_soul_track(provider, BENCH_SEED, BENCH_PARAMS, out_dir=out_dir, cache=False)
+    return run
+
+# --- 2. THE PRODUCER (mic.py) ---
+@benchmark("mic.process_vocals_deep")
+def bench_vocals():
+    import mic
+    vocals = synthetic_vocals()
+    def run():
+        with quiet():
+            mic.process_vocals_deep(vocals, 44100)
+    return run
+
+@benchmark("mic.live_chain_block")
+def bench_live_block():
+    import mic
+    chain = mic.LiveVocalChain(44100)
+    block = synthetic_vocals(mic.LIVE_BLOCK / 44100)
+    return lambda: chain.process(block)
+
+# --- 3. THE ARTIST (video.py) ---
+@benchmark("video.analyze_audio")
+def bench_analysis():
+    import video
+    video.FEATURE_CACHE_DIR = None # Always listen, never read the cache
+    song = synthetic_song(os.path.join(BENCH_DIR, "song.wav"))
+    def run():
+        with quiet():
+            video.analyze_audio(song)
+    return run
+
+def bench_canvas():
+    import video
+    art = video.ArtGen(headless=True)
+    with quiet():
+        art.prepare_canvas(0.4, os.path.join(BENCH_DIR, "frames.mp4"), None)
+    return video, art
+
+@benchmark("video.paint_frame", units=256)
+def bench_paint():
+    video, art = bench_canvas()
+    vols = np.random.default_rng(2).random(256)
+    pitches = np.random.default_rng(3).random(256)
+    trajectory = video.compute_trajectory(vols, pitches, len(vols) / video.PHYSICS_RATE, 0)
+    trajectory = video.scale_trajectory(trajectory, art.width, art.height)
+    return lambda: art.paint_steps(trajectory, 0, len(trajectory[0])) # One brush step per frame, 256 per call
+
+@benchmark("video.frame_convert")
+def bench_convert():
+    import pygame
+    video, art = bench_canvas()
+    def run():
+        view = pygame.surfarray.array3d(art.screen).transpose([1, 0, 2])
+        return video.cv2.cvtColor(view, video.cv2.COLOR_RGB2BGR)
+    return run
+
+@benchmark("video.encode_frame")
+def bench_encode():
+    video, art = bench_canvas()
+    frame = np.random.default_rng(4).integers(0, 255, (video.HEIGHT, video.WIDTH, 3), dtype=np.uint8)
+    return lambda: art.video_writer.write(frame)
+
+# --- RUNNER ---
+def measure(fn, repeat, units=1):
+    """Seconds per unit: median and best of `repeat` rounds, each long enough to time reliably."""
+    fn() # Warm up imports, caches and the allocator
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    rounds = [t / number / units for t in timer.repeat(repeat=repeat, number=number)]
+    return {"median": float(np.median(rounds)), "best": min(rounds), "rounds": repeat, "calls_per_round": number,
+            "units_per_call": units}
+
+def run_benchmarks(pattern=None, repeat=None):
+    results, skipped = {}, {}
+    for name, (setup, default_repeat, units) in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        try:
+            fn = setup()
+        except ImportError as e:
+            skipped[name] = str(e)
+            print(f"{name:<32} skipped ({e})")
+            continue
+        results[name] = measure(fn, repeat or default_repeat, units)
+        print(f"{name:<32} {results[name]['median'] * 1000:10.3f} ms  (best {results[name]['best'] * 1000:.3f})")
+    return results, skipped
+
+def check_regressions(results, baseline, max_slowdown, limits):
+    """Returns the benchmarks that got slower than their allowed factor over the baseline."""
+    failures = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        allowed = limits.get(name, max_slowdown)
+        ratio = result["median"] / baseline[name]["median"]
+        if ratio > allowed:
+            failures.append((name, ratio, allowed))
+    return failures
+
+def parse_limits(values):
+    limits = {}
+    for value in values or []:
+        name, _, factor = value.partition("=")
+        limits[name] = float(factor)
+    return limits
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Times the band, the producer and the artist.")
+    parser.add_argument("-k", "--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, help="Rounds per benchmark (default: per benchmark)")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="Where the JSON results go")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--max-slowdown", type=float, default=1.25,
+                        help="Fail if a benchmark's median is this many times the baseline's")
+    parser.add_argument("--limit", action="append", metavar="NAME=FACTOR",
+                        help="Per-benchmark slowdown limit, e.g. --limit app.generate_soul_track=1.1")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        sys.exit()
+
+    results, skipped = run_benchmarks(args.filter, args.repeat)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "numpy": np.__version__,
+                    "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+        "skipped": skipped,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        failures = check_regressions(results, baseline, args.max_slowdown, parse_limits(args.limit))
+        for name, ratio, allowed in failures:
+            print(f"REGRESSION: {name} is {ratio:.2f}x the baseline (allowed {allowed:.2f}x)")
+        if failures:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
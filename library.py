@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import numpy as np
+
+# --- TRACK LIBRARY ---
+# app.py registers every render here with everything it knew when writing it: seed, sheet music,
+# length, checksum and sidecar files. mic.py and video.py ask for "the latest" or "seed 123" / "80 BPM in F#"
+# with one indexed query instead of globbing and stat-ing a directory of thousands of renders.
+
+CACHE_DIR = os.environ.get("SEDUCER_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "the-seducer"))
+LIBRARY_PATH = os.environ.get("SEDUCER_LIBRARY", os.path.join(CACHE_DIR, "library.db"))
+
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    seed INTEGER,
+    bpm INTEGER,
+    key TEXT,
+    root_freq REAL,
+    params TEXT,
+    duration REAL,
+    sample_rate INTEGER,
+    checksum TEXT,
+    sidecars TEXT,
+    created REAL
+);
+CREATE INDEX IF NOT EXISTS tracks_by_seed ON tracks (seed, id);
+CREATE INDEX IF NOT EXISTS tracks_by_bpm_key ON tracks (bpm, key, id);
+CREATE INDEX IF NOT EXISTS tracks_by_key ON tracks (key, id);
+"""
+
+def note_name(freq):
+    """Pitch class of a frequency, e.g. 46.25 -> "F#"."""
+    return NOTE_NAMES[(int(round(12 * np.log2(freq / 440.0))) + 9) % 12] # A is 9 semitones above C
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def connect(path=None):
+    path = path or LIBRARY_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Batch renders register from several processes at once: wait for the lock instead of failing
+    db = sqlite3.connect(path, timeout=30)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+    return db
+
+def register_track(path, seed, params, bpm, root_freq, duration, sample_rate, sidecars=None, db_path=None):
+    """
+    Adds a finished render. params is the session's sheet music as given; bpm and root_freq are
+    what the render actually used (params may leave them out and get defaults).
+    """
+    db = connect(db_path)
+    try:
+        with db:
+            db.execute(
+                "INSERT INTO tracks (path, seed, bpm, key, root_freq, params, duration, sample_rate, checksum,"
+                " sidecars, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), seed, int(bpm), note_name(float(root_freq)),
+                 float(root_freq), json.dumps(params), duration, sample_rate, file_checksum(path),
+                 json.dumps({kind: os.path.abspath(p) for kind, p in (sidecars or {}).items()}), time.time()))
+    finally:
+        db.close()
+
+def find_track(seed=None, bpm=None, key=None, db_path=None):
+    """
+    The newest render matching every given field (all None = the newest render), as a dict,
+    or None. Renders whose file has since been deleted are skipped.
+    """
+    if not os.path.exists(db_path or LIBRARY_PATH):
+        return None
+    if key:
+        key = key[0].upper() + key[1:]
+    where, values = [], []
+    for column, value in (("seed", seed), ("bpm", bpm), ("key", key)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            values.append(value)
+    query = "SELECT * FROM tracks" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id DESC"
+
+    db = connect(db_path)
+    try:
+        for row in db.execute(query, values):
+            if os.path.exists(row["path"]):
+                track = dict(row)
+                track["params"] = json.loads(track["params"])
+                track["sidecars"] = json.loads(track["sidecars"])
+                return track
+    finally:
+        db.close()
+    return None
+
+def describe(track):
+    return f"seed {track['seed']}, {track['bpm']} BPM in {track['key']}, {track['duration']:.0f}s"
@@ -1,16 +1,41 @@
-import sounddevice as sd
 import numpy as np
 import scipy.io.wavfile as wavfile
 import scipy.signal as signal
 import os
 import glob
 import time
+import argparse
+import json
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import profiling
+from wavstream import StreamingWavWriter
+from stems import load_stems, mixdown, write_mixdown
+from library import find_track, describe
 
 # --- CONFIGURATION ---
 MUSIC_VOLUME = 0.2      # Background music (Very Quiet)
 VOCAL_VOLUME = 2.0      # Main Voice (LOUD and CLEAR)
 SAMPLE_RATE = 44100     
 
+# The vocal chain (see process_vocals_deep)
+BAND_LOW_HZ = 60.0      # Deep lows stay
+BAND_HIGH_HZ = 7000.0   # Static hiss above this goes
+BASS_CUTOFF_HZ = 250.0  # What counts as "bass" for the injection
+BASS_GAIN = 0.6         # How much bass is mixed back in
+
+def find_backing_track(seed=None, bpm=None, key=None):
+    """The newest render in the track library matching the query; without a library, the newest file here."""
+    track = find_track(seed, bpm, key)
+    if track:
+        print(f"FOUND IN LIBRARY: {describe(track)}")
+        return track["path"]
+    if seed is not None or bpm is not None or key is not None:
+        print("ERROR: No track in the library matches that. Render one with app.py first.")
+        return None
+    return find_latest_backing_track()
+
 def find_latest_backing_track():
     files = glob.glob("Soul_Improv_*.wav")
     if not files:
@@ -20,39 +45,108 @@ def find_latest_backing_track():
         return None
     return max(files, key=os.path.getctime)
 
-def process_vocals_deep(audio, rate):
+@lru_cache(maxsize=None)
+def design_vocal_chain(rate, low=BAND_LOW_HZ, high=BAND_HIGH_HZ, bass=BASS_CUTOFF_HZ):
+    """The chain's Butterworth filters as second-order sections, designed once per rate and corners."""
+    nyquist = 0.5 * rate
+    band = signal.butter(4, [low/nyquist, high/nyquist], btype='band', output='sos')
+    bass = signal.butter(4, bass/nyquist, btype='low', output='sos')
+    return band, bass
+
+def filtfilt_padlen(sos):
+    """filtfilt's default edge padding, 3 * max(len(a), len(b)), for the same filter in SOS form."""
+    return 3 * (2 * len(sos) + 1)
+
+@profiling.profiled("process_vocals")
+def process_vocals_deep(audio, rate, low=BAND_LOW_HZ, high=BAND_HIGH_HZ, bass=BASS_CUTOFF_HZ, bass_gain=BASS_GAIN):
     """
     1. Removes static/hiss.
     2. Boosts the BASS frequencies to make voice sound deep.
     """
     print("Processing vocals: Removing static + Boosting Bass...")
+    profiling.current().audio_seconds = len(audio) / rate
+    band_sos, bass_sos = design_vocal_chain(rate, low, high, bass)
     
     # --- STEP 1: CLEANING (The Bandpass) ---
     # We keep 60Hz (Deep lows) to 7000Hz (Clarity)
     # Removing frequencies above 7000Hz kills the "static hiss"
-    nyquist = 0.5 * rate
-    b, a = signal.butter(4, [60.0/nyquist, 7000.0/nyquist], btype='band')
-    clean_audio = signal.filtfilt(b, a, audio)
+    clean_audio = signal.sosfiltfilt(band_sos, audio, padlen=filtfilt_padlen(band_sos))
     
     # --- STEP 2: BASS INJECTION (The "Deep" Effect) ---
     # We create a copy of the audio that contains ONLY the bass (under 250Hz)
-    b_bass, a_bass = signal.butter(4, 250.0/nyquist, btype='low')
-    bass_only = signal.filtfilt(b_bass, a_bass, clean_audio)
+    bass_only = signal.sosfiltfilt(bass_sos, clean_audio, padlen=filtfilt_padlen(bass_sos))
     
     # We mix the bass back in, amplified by 50%
     # This artificially thickens the voice
-    thick_vocals = clean_audio + (bass_only * 0.6)
+    thick_vocals = clean_audio + (bass_only * bass_gain)
     
     return thick_vocals
 
-def record_over_track(backing_filename):
-    print(f"\nLOADING TRACK: {backing_filename}")
-    file_rate, backing_data = wavfile.read(backing_filename)
+@profiling.profiled("mix")
+def mix_take(backing_data, vocals, music_volume=MUSIC_VOLUME, vocal_volume=VOCAL_VOLUME):
+    """Levels, sum and the safety limiter. Returns the final mix as floats."""
+    # 1. Match Lengths
+    min_len = min(len(backing_data), len(vocals))
+    backing_data = backing_data[:min_len]
+    vocals = vocals[:min_len]
 
-    if backing_data.dtype == np.int16:
-        backing_data = backing_data.astype(np.float32) / 32768.0
+    # 2. Apply Volume Levels
+    backing_quiet = backing_data * music_volume
+    vocals_loud = vocals * vocal_volume 
 
-    print(f"DURATION: {len(backing_data)/file_rate:.1f} seconds")
+    # 3. Combine
+    if backing_quiet.ndim == 1:
+        final_mix = backing_quiet + vocals_loud
+    else:
+        vocals_stereo = vocals_loud[:, np.newaxis]
+        final_mix = backing_quiet + vocals_stereo
+
+    # 4. Safety Limiter (Warm Saturation)
+    # This is critical because we boosted the bass and volume.
+    # It squeezes the sound so it doesn't crackle.
+    peak = np.max(np.abs(final_mix))
+    if peak > 0.95:
+        print("Applying warm compression (limiting peaks)...")
+        final_mix = np.tanh(final_mix)
+    return final_mix
+
+def stem_levels(args):
+    """Levels given on the command line, as {group: level}. Empty means play the mix as rendered."""
+    return {group: level for group, level in
+            (("drums", args.drums), ("keys", args.keys), ("sax", args.sax)) if level is not None}
+
+@profiling.profiled("load_backing")
+def load_backing_track(backing_filename, levels=None):
+    """Returns (rate, float audio). With levels, the track is remixed from its stems instead."""
+    if levels:
+        stems = load_stems(backing_filename)
+        if stems:
+            file_rate, stem_audio = stems
+            print("REMIXING STEMS: " + ", ".join(f"{group} x{levels.get(group, 1.0):g}" for group in stem_audio))
+            return file_rate, mixdown(stem_audio, levels).astype(np.float32)
+        print("No stems for this track (render it with app.py --stems). Using the mix as is.")
+
+    return read_wav_float(backing_filename)
+
+def read_wav_float(path):
+    """Memory-mapped read; int16 files come back as float32 in [-1, 1]."""
+    file_rate, data = wavfile.read(path, mmap=True)
+    if data.dtype == np.int16:
+        data = data.astype(np.float32) / 32768.0
+    return file_rate, data
+
+def remix_track(backing_filename, levels):
+    """Writes the stems at new levels as a WAV, without recording."""
+    stems = load_stems(backing_filename)
+    if not stems:
+        print("ERROR: No stems for this track. Render it with app.py --stems.")
+        return
+    file_rate, stem_audio = stems
+    output_filename = os.path.splitext(backing_filename)[0] + "_remix.wav"
+    write_mixdown(output_filename, stem_audio, file_rate, levels)
+    print(f"SUCCESS! Saved as: {output_filename}")
+
+def count_in():
     print("\nIMPORTANT: WEAR HEADPHONES (to prevent echo)!")
     print("GET CLOSER TO THE MIC FOR MORE BASS!")
     print("\nGet ready... Recording starts in 3 seconds.")
@@ -60,46 +154,334 @@ def record_over_track(backing_filename):
     time.sleep(1); print("2...")
     time.sleep(1); print("1... SING!")
 
+def record_over_track(backing_filename, levels=None):
+    print(f"\nLOADING TRACK: {backing_filename}")
+    file_rate, backing_data = load_backing_track(backing_filename, levels)
+
+    print(f"DURATION: {len(backing_data)/file_rate:.1f} seconds")
+    count_in()
+
     # --- RECORD ---
-    recording = sd.playrec(backing_data, samplerate=SAMPLE_RATE, channels=1, dtype='float32')
-    sd.wait()
+    import sounddevice as sd # Only recording needs a sound card
+    with profiling.span("record", audio_seconds=len(backing_data) / file_rate):
+        recording = sd.playrec(backing_data, samplerate=SAMPLE_RATE, channels=1, dtype='float32')
+        sd.wait()
     print("Recording finished! Mixing...")
 
     vocals = recording.flatten()
+
+    # Keep the dry take, so it can be remixed later without singing again (--reprocess)
+    with profiling.span("write_wav"):
+        wavfile.write("Final_Deep_Mix.raw.wav", SAMPLE_RATE, vocals)
+    write_take_sidecar("Final_Deep_Mix.json", {"backing_track": os.path.abspath(backing_filename),
+                                               "levels": levels or {}, "sample_rate": SAMPLE_RATE,
+                                               "mix": "Final_Deep_Mix.wav", "raw": "Final_Deep_Mix.raw.wav",
+                                               "complete": True})
     
     # --- MAGIC PROCESSING ---
     # 1. Apply the Deep Voice Cleaners
     vocals = process_vocals_deep(vocals, SAMPLE_RATE)
 
-    # 2. Match Lengths
-    min_len = min(len(backing_data), len(vocals))
-    backing_data = backing_data[:min_len]
-    vocals = vocals[:min_len]
+    # 2. Levels, mix and limiter
+    final_mix = mix_take(backing_data, vocals)
 
-    # 3. Apply Volume Levels
-    backing_quiet = backing_data * MUSIC_VOLUME
-    vocals_loud = vocals * VOCAL_VOLUME 
+    output_filename = "Final_Deep_Mix.wav"
+    with profiling.span("write_wav"):
+        wavfile.write(output_filename, SAMPLE_RATE, (final_mix * 32767).astype(np.int16))
+    print(f"\nSUCCESS! Saved as: {output_filename}")
 
-    # 4. Combine
-    if backing_quiet.ndim == 1:
-        final_mix = backing_quiet + vocals_loud
-    else:
-        vocals_stereo = vocals_loud[:, np.newaxis]
-        final_mix = backing_quiet + vocals_stereo
+# --- LIVE MODE ---
+# The chain runs block by block while you sing: you hear the finished voice in your headphones,
+# and the mix is on disk the moment the track ends. Zero-phase filtfilt needs the whole take,
+# so live mode uses the same Butterworth designs as causal filters, with state carried across blocks.
+LIVE_BLOCK = 256 # Frames per callback (~6ms at 44.1kHz)
 
-    # 5. Safety Limiter (Warm Saturation)
-    # This is critical because we boosted the bass and volume.
-    # It squeezes the sound so it doesn't crackle.
-    peak = np.max(np.abs(final_mix))
-    if peak > 0.95:
-        print("Applying warm compression (limiting peaks)...")
-        final_mix = np.tanh(final_mix)
+class LiveVocalChain:
+    """Cleaning + bass injection, one block at a time."""
+    def __init__(self, rate):
+        self.band, self.bass = design_vocal_chain(rate)
+        self.band_state = np.zeros((self.band.shape[0], 2))
+        self.bass_state = np.zeros((self.bass.shape[0], 2))
 
-    output_filename = "Final_Deep_Mix.wav"
-    wavfile.write(output_filename, SAMPLE_RATE, (final_mix * 32767).astype(np.int16))
-    print(f"\nSUCCESS! Saved as: {output_filename}")
+    def process(self, block):
+        clean, self.band_state = signal.sosfilt(self.band, block, zi=self.band_state)
+        bass_only, self.bass_state = signal.sosfilt(self.bass, clean, zi=self.bass_state)
+        return clean + (bass_only * BASS_GAIN)
+
+def mix_live_block(backing, vocals):
+    """Levels + warm saturation for one block. tanh is always on: switching it per block would click."""
+    vocals_loud = vocals * VOCAL_VOLUME
+    if backing.ndim > 1:
+        vocals_loud = vocals_loud[:, np.newaxis]
+    return np.tanh(backing * MUSIC_VOLUME + vocals_loud)
+
+class BlockStats:
+    """Running count/mean/worst, so hour-long sessions don't grow a list per block."""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.worst = max(self.worst, value)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+# --- TAKES ---
+# Every live take streams to numbered files (Take_001.wav, .raw.wav, .json) as it is sung.
+# The sidecar JSON names the backing track, so a take can always be remixed later.
+WRITE_CHUNK_SECONDS = 1.0 # fsync'd this often: a crash loses at most this much of a take
+WRITE_RING_CHUNKS = 8     # Slack for a slow disk before the callback has to drop audio
+
+class TakeWriter:
+    """
+    Gets a take from the audio callback to disk without ever blocking the callback.
+    Blocks are copied into a preallocated ring; a writer thread drains it a chunk at a time
+    and fsyncs both files, so memory stays flat however long the take runs.
+    """
+    def __init__(self, mix_filename, raw_filename, channels, sample_rate=SAMPLE_RATE):
+        self.chunk = int(WRITE_CHUNK_SECONDS * sample_rate)
+        self.ring = np.zeros((self.chunk * WRITE_RING_CHUNKS, channels + 1), dtype=np.float32)
+        self.channels = channels
+        self.read_pos = 0
+        self.write_pos = 0 # Both only grow; index with % len(ring)
+        self.dropped = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.mix_wav = StreamingWavWriter(mix_filename, sample_rate, channels)
+        self.raw_wav = StreamingWavWriter(raw_filename, sample_rate, dtype="float32")
+        self.thread = threading.Thread(target=self._drain)
+        self.thread.start()
+
+    def put(self, mix, voice):
+        """From the audio callback. If the disk has fallen too far behind, the block is dropped and counted."""
+        frames = len(voice)
+        with self.cond:
+            free = len(self.ring) - (self.write_pos - self.read_pos)
+        if frames > free:
+            self.dropped += frames
+            return
+        rows = (self.write_pos + np.arange(frames)) % len(self.ring)
+        self.ring[rows, :self.channels] = mix.reshape(frames, -1)
+        self.ring[rows, self.channels] = voice
+        with self.cond:
+            self.write_pos += frames
+            self.cond.notify()
+
+    def _drain(self):
+        while True:
+            with self.cond:
+                while self.write_pos - self.read_pos < self.chunk and not self.closed:
+                    self.cond.wait()
+                frames = min(self.chunk, self.write_pos - self.read_pos)
+            if not frames:
+                return # Closed and empty
+            block = self.ring[(self.read_pos + np.arange(frames)) % len(self.ring)]
+            self.mix_wav.write(block[:, :self.channels])
+            self.raw_wav.write(block[:, self.channels])
+            self.mix_wav.flush(sync=True)
+            self.raw_wav.flush(sync=True)
+            with self.cond:
+                self.read_pos += frames
+
+    @property
+    def frames_written(self):
+        return self.raw_wav.frames
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+        self.mix_wav.close()
+        self.raw_wav.close()
+
+def next_take_number(folder="."):
+    numbers = [int(name[5:8]) for name in os.listdir(folder)
+               if name.startswith("Take_") and name.endswith(".json") and name[5:8].isdigit()]
+    return max(numbers, default=0) + 1
+
+def write_take_sidecar(path, info):
+    """Atomic, so a crash mid-write never leaves a half-written sidecar."""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp, path)
+
+def record_take(take, backing_filename, backing_data, levels=None):
+    """One live take over backing_data (already loaded), streamed to Take_NNN files."""
+    import sounddevice as sd
+    channels = 1 if backing_data.ndim == 1 else backing_data.shape[1]
+    base = f"Take_{take:03d}"
+    output_filename, raw_filename = f"{base}.wav", f"{base}.raw.wav" # The dry take is for reprocessing later
+    info = {"take": take, "backing_track": os.path.abspath(backing_filename), "levels": levels or {},
+            "sample_rate": SAMPLE_RATE, "music_volume": MUSIC_VOLUME, "vocal_volume": VOCAL_VOLUME,
+            "mix": output_filename, "raw": raw_filename,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "complete": False}
+    write_take_sidecar(f"{base}.json", info)
+
+    chain = LiveVocalChain(SAMPLE_RATE)
+    latency, cpu = BlockStats(), BlockStats()
+    xruns = [0]
+    position = [0]
+    finished = threading.Event()
+    writer = TakeWriter(output_filename, raw_filename, channels)
+
+    def callback(indata, outdata, frames, time_info, status):
+        start = time.perf_counter()
+        if status:
+            xruns[0] += 1
+        backing = backing_data[position[0]:position[0] + frames]
+        voice = indata[:len(backing), 0]
+        mix = mix_live_block(backing, chain.process(voice))
+        outdata[:len(mix)] = mix.reshape(len(mix), -1)
+        outdata[len(mix):] = 0
+        writer.put(mix, voice)
+        position[0] += frames
+
+        # Mic-to-headphones time for this block, as the audio driver timestamps it
+        latency.add(time_info.outputBufferDacTime - time_info.inputBufferAdcTime)
+        cpu.add(time.perf_counter() - start)
+        if position[0] >= len(backing_data):
+            raise sd.CallbackStop
+
+    stream = sd.Stream(samplerate=SAMPLE_RATE, blocksize=LIVE_BLOCK, channels=(1, channels),
+                       dtype='float32', callback=callback, finished_callback=finished.set)
+    print(f"\n--- TAKE {take} ---")
+    count_in()
+    with profiling.span("take") as take_span:
+        try:
+            with stream:
+                finished.wait()
+        except KeyboardInterrupt:
+            print("\nStopped early.")
+        finally:
+            writer.close()
+            info.update(complete=True, frames=writer.frames_written, dropped_frames=writer.dropped)
+            write_take_sidecar(f"{base}.json", info)
+        take_span.audio_seconds = position[0] / SAMPLE_RATE
+    profiling.count("blocks", cpu.count)
+    profiling.count("xruns", xruns[0])
+    profiling.count("dropped_frames", writer.dropped)
+
+    block_ms = LIVE_BLOCK / SAMPLE_RATE * 1000
+    print(f"\n{cpu.count} blocks of {block_ms:.1f}ms | stream latency (in/out): "
+          f"{stream.latency[0] * 1000:.1f}/{stream.latency[1] * 1000:.1f}ms")
+    print(f"Measured latency: avg {latency.mean * 1000:.1f}ms, worst {latency.worst * 1000:.1f}ms")
+    print(f"Chain CPU per block: avg {cpu.mean * 1000:.2f}ms ({cpu.mean * 1000 / block_ms:.0%} of the block), "
+          f"worst {cpu.worst * 1000:.2f}ms | xruns: {xruns[0]} | dropped: {writer.dropped} frames")
+    print(f"SUCCESS! Saved as: {output_filename} (dry vocal: {raw_filename})")
+
+def record_takes(backing_filename, levels=None, takes=1):
+    """Back-to-back live takes. The backing track is loaded and converted once for the whole session."""
+    print(f"\nLOADING TRACK: {backing_filename}")
+    file_rate, backing_data = load_backing_track(backing_filename, levels)
+    backing_data = backing_data.astype(np.float32)
+    print(f"DURATION: {len(backing_data)/file_rate:.1f} seconds (live monitoring, {takes} take{'s' if takes > 1 else ''})")
+
+    for _ in range(takes):
+        record_take(next_take_number(), backing_filename, backing_data, levels)
+
+# --- REPROCESS ---
+# Changed the levels or the filter corners? Every dry take (*.raw.wav) in a session folder goes back
+# through the offline chain against the backing track its sidecar names, one take per process.
+RAW_SUFFIX = ".raw.wav"
+
+def find_takes(folder, backing=None):
+    """Yields (dry take, backing track, stem levels) for every take in folder. backing overrides the sidecars."""
+    for raw_path in sorted(glob.glob(os.path.join(folder, "*" + RAW_SUFFIX))):
+        track, levels = backing, {}
+        try:
+            with open(raw_path[:-len(RAW_SUFFIX)] + ".json") as f:
+                info = json.load(f)
+            track = track or info.get("backing_track")
+            levels = info.get("levels") or {}
+        except (OSError, ValueError):
+            pass
+        if track and not os.path.exists(track):
+            track = os.path.join(folder, os.path.basename(track)) # The session folder was moved
+        if not track or not os.path.exists(track):
+            print(f"SKIPPING {raw_path}: no backing track (pass --backing)")
+            continue
+        yield raw_path, track, levels
+
+@profiling.profiled()
+def reprocess_take(raw_path, backing_filename, levels, output_filename, settings):
+    """One take through the whole chain. Safe to run in a worker process."""
+    file_rate, vocals = read_wav_float(raw_path)
+    _, backing_data = load_backing_track(backing_filename, levels)
+
+    vocals = process_vocals_deep(vocals, file_rate, settings["low"], settings["high"], settings["bass"],
+                                 settings["bass_gain"])
+    final_mix = mix_take(backing_data, vocals, settings["music_volume"], settings["vocal_volume"])
+    with profiling.span("write_wav"):
+        wavfile.write(output_filename, file_rate, (final_mix * 32767).astype(np.int16))
+    return output_filename
+
+def reprocess_session(folder, settings, out_dir=None, workers=None, backing=None):
+    out_dir = out_dir or folder
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = list(find_takes(folder, backing))
+    print(f"Reprocessing {len(jobs)} takes from {folder}...")
+
+    start = time.perf_counter()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for raw_path, track, levels in jobs:
+            output_filename = os.path.join(out_dir, os.path.basename(raw_path)[:-len(RAW_SUFFIX)] + ".remix.wav")
+            futures[pool.submit(reprocess_take, raw_path, track, levels, output_filename, settings)] = raw_path
+        for future in as_completed(futures):
+            try:
+                print(f"DONE: {future.result()}")
+                done += 1
+            except Exception as e:
+                print(f"FAILED: {futures[future]} ({e})")
+    print(f"\nReprocessed {done}/{len(jobs)} takes in {time.perf_counter() - start:.1f}s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="The Producer: records your vocals over a backing track.")
+    parser.add_argument("track", nargs="?", help="Backing track (default: the newest render in the library)")
+    parser.add_argument("--track-seed", type=int, help="Use the newest render of this seed")
+    parser.add_argument("--bpm", type=int, help="Use the newest render at this tempo")
+    parser.add_argument("--key", help="Use the newest render in this key (e.g. F#)")
+    parser.add_argument("--drums", type=float, help="Drum level when remixing from stems (1.0 = as rendered)")
+    parser.add_argument("--keys", type=float, help="Keys level when remixing from stems")
+    parser.add_argument("--sax", type=float, help="Sax level when remixing from stems")
+    parser.add_argument("--remix-only", action="store_true", help="Write the remixed backing track and stop")
+    parser.add_argument("--live", action="store_true",
+                        help="Process the voice as you sing: live monitoring, written to disk as it records")
+    parser.add_argument("--takes", type=int, help="Record this many live takes back to back (implies --live)")
+    parser.add_argument("--reprocess", metavar="DIR", help="Remix every dry take in DIR with the settings below")
+    parser.add_argument("--backing", help="--reprocess: use this backing track for every take")
+    parser.add_argument("--out-dir", help="--reprocess: where remixes go (default: next to the takes)")
+    parser.add_argument("--workers", type=int, help="--reprocess: processes (default: one per core)")
+    parser.add_argument("--music-volume", type=float, default=MUSIC_VOLUME)
+    parser.add_argument("--vocal-volume", type=float, default=VOCAL_VOLUME)
+    parser.add_argument("--low-cut", type=float, default=BAND_LOW_HZ, help="Bandpass low corner (Hz)")
+    parser.add_argument("--high-cut", type=float, default=BAND_HIGH_HZ, help="Bandpass high corner (Hz)")
+    parser.add_argument("--bass-cut", type=float, default=BASS_CUTOFF_HZ, help="Bass injection corner (Hz)")
+    parser.add_argument("--bass-gain", type=float, default=BASS_GAIN, help="Bass injection amount")
+    parser.add_argument("--profile", nargs="?", const="", metavar="OUT",
+                        help="Time every stage; OUT.trace.json saves a Chrome trace, other .json paths plain JSON")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    track = find_latest_backing_track()
-    if track:
-        record_over_track(track)
+    args = parse_args()
+    if args.profile is not None:
+        profiling.enable(args.profile or None)
+    track = None if args.reprocess else args.track or find_backing_track(args.track_seed, args.bpm, args.key)
+    if args.reprocess:
+        settings = {"music_volume": args.music_volume, "vocal_volume": args.vocal_volume, "low": args.low_cut,
+                    "high": args.high_cut, "bass": args.bass_cut, "bass_gain": args.bass_gain}
+        reprocess_session(args.reprocess, settings, args.out_dir, args.workers, args.backing)
+    elif track and args.remix_only:
+        remix_track(track, stem_levels(args))
+    elif track and (args.live or args.takes):
+        record_takes(track, stem_levels(args), args.takes or 1)
+    elif track:
+        record_over_track(track, stem_levels(args))
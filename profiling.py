@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import atexit
+import functools
+import shutil
+import tempfile
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+
+# --- PROFILING ---
+# Where did a slow render go: the QRNG, the bandleader, synthesis, the WAV write, librosa, drawing,
+# the encode? Wrap each stage in a span and bump counters as work happens:
+#
+#     with profiling.span("synthesis", audio_seconds=duration):
+#         ...
+#     profiling.count("notes_synthesized")
+#
+# Off by default: span() hands back a shared do-nothing object and count() returns at once.
+# Turned on with --profile on any script (or SEDUCER_PROFILE=1 / =out.json in the environment).
+# On exit it prints a summary line per stage (with realtime factor where the stage knows how much
+# audio it covered) and, given a path, writes the spans: *.trace.json as a Chrome trace
+# (chrome://tracing or ui.perfetto.dev), any other path as plain JSON.
+# Worker processes inherit the setting and hand their spans back to the main process.
+
+ENV_FLAG = "SEDUCER_PROFILE"
+ENV_PARENT = "SEDUCER_PROFILE_PARENT"
+
+ENABLED = False
+OUTPUT = None
+MAIN_PID = int(os.environ.get(ENV_PARENT, os.getpid()))
+
+_events = []
+_counters = Counter()
+_local = threading.local()
+_lock = threading.Lock()
+
+class _NullSpan:
+    """What span() returns while profiling is off."""
+    audio_seconds = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    def __init__(self, name, audio_seconds=None):
+        self.name = name
+        self.audio_seconds = audio_seconds # May also be set inside the with-block, once it's known
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        self.path = f"{self.parent.path}/{self.name}" if self.parent else self.name
+        self.depth = len(stack)
+        stack.append(self)
+        # tracemalloc has one global peak: bank it for the enclosing span, then measure ours from zero
+        self.peak = 0
+        if self.parent:
+            self.parent.peak = max(self.parent.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        if self.parent:
+            self.parent.peak = max(self.parent.peak, self.peak)
+        tracemalloc.reset_peak()
+        _stack().pop()
+        with _lock:
+            _events.append({"name": self.name, "path": self.path, "start": self.start,
+                            "seconds": end - self.start, "depth": self.depth, "peak_bytes": self.peak, "audio_seconds": self.audio_seconds,
+                            "pid": os.getpid(), "tid": threading.get_ident()})
+        if self.depth == 0 and os.getpid() != MAIN_PID:
+            _flush_to_parent()
+        return False
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+def span(name, audio_seconds=None):
+    """Times the with-block as a stage. Spans nest; each records its wall time and peak traced memory."""
+    return Span(name, audio_seconds) if ENABLED else NULL_SPAN
+
+def current():
+    """The innermost open span on this thread, e.g. to set its audio_seconds once known."""
+    stack = _stack() if ENABLED else None
+    return stack[-1] if stack else NULL_SPAN
+
+def profiled(name=None):
+    """Decorator: the whole call is one span (named after the function by default)."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            with span(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return call
+    return wrap
+
+def count(name, n=1):
+    if ENABLED:
+        _counters[name] += n
+
+def enable(output=None):
+    """Turns profiling on for this process and every worker it starts."""
+    global ENABLED, OUTPUT
+    if ENABLED:
+        return
+    ENABLED = True
+    OUTPUT = output
+    os.environ[ENV_FLAG] = output or "1"
+    os.environ[ENV_PARENT] = str(MAIN_PID)
+    tracemalloc.start()
+    if os.getpid() == MAIN_PID:
+        atexit.register(finish)
+
+# -- Worker processes --
+# Pool workers often end with os._exit, which skips atexit, so each finished top-level span
+# is appended to a per-process file right away. The main process merges them when it exits.
+def _parts_dir():
+    return os.path.join(tempfile.gettempdir(), f"seducer-profile-{MAIN_PID}")
+
+def _forget_parent():
+    """A forked worker starts with a copy of the parent's open spans and results: drop them."""
+    _local.stack = []
+    _events.clear()
+    _counters.clear()
+
+os.register_at_fork(after_in_child=_forget_parent)
+
+def _flush_to_parent():
+    os.makedirs(_parts_dir(), exist_ok=True)
+    with _lock:
+        events, counters = list(_events), dict(_counters)
+        _events.clear()
+        _counters.clear()
+    with open(os.path.join(_parts_dir(), f"{os.getpid()}.jsonl"), "a") as f:
+        f.write(json.dumps({"events": events, "counters": counters}) + "\n")
+
+def _collect():
+    events, counters = list(_events), Counter(_counters)
+    if os.path.isdir(_parts_dir()):
+        for name in os.listdir(_parts_dir()):
+            with open(os.path.join(_parts_dir(), name)) as f:
+                for line in f:
+                    part = json.loads(line)
+                    events += part["events"]
+                    counters.update(part["counters"])
+        shutil.rmtree(_parts_dir(), ignore_errors=True)
+    return sorted(events, key=lambda e: e["start"]), counters
+
+# -- Output --
+def summary(events, counters):
+    """
+    A line per stage (nested stages as parent/child, repeats added up): total time, calls,
+    realtime factor for stages that said how much audio they covered, and peak memory. Then the counters.
+    """
+    stages = defaultdict(lambda: {"seconds": 0.0, "audio_seconds": 0.0, "peak_bytes": 0, "calls": 0})
+    for event in events:
+        stage = stages[event["path"]]
+        stage["seconds"] += event["seconds"]
+        stage["audio_seconds"] += event["audio_seconds"] or 0.0
+        stage["peak_bytes"] = max(stage["peak_bytes"], event["peak_bytes"])
+        stage["calls"] += 1
+
+    lines = []
+    for path, stage in stages.items():
+        line = f"[profile] {path:<36} {stage['seconds']:9.3f}s"
+        line += f"  x{stage['calls']:<6}" if stage["calls"] > 1 else " " * 9
+        line += f"  peak {stage['peak_bytes'] / 1e6:7.1f}MB"
+        if stage["audio_seconds"] and stage["seconds"] > 0:
+            line += f"  {stage['audio_seconds'] / stage['seconds']:.1f}x realtime"
+        lines.append(line)
+    if counters:
+        lines.append("[profile] " + "  ".join(f"{name}={value}" for name, value in sorted(counters.items())))
+    return "\n".join(lines)
+
+def chrome_trace(events, counters):
+    trace = [{"name": e["name"], "ph": "X", "ts": e["start"] * 1e6, "dur": e["seconds"] * 1e6,
+              "pid": e["pid"], "tid": e["tid"],
+              "args": {"peak_mb": e["peak_bytes"] / 1e6, "audio_seconds": e["audio_seconds"]}} for e in events]
+    if counters and events:
+        end = max(e["start"] + e["seconds"] for e in events)
+        trace.append({"name": "counters", "ph": "C", "ts": end * 1e6, "pid": MAIN_PID, "tid": 0,
+                      "args": dict(counters)})
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+def finish():
+    events, counters = _collect()
+    if not events and not counters:
+        return
+    print(summary(events, counters))
+    if OUTPUT:
+        data = chrome_trace(events, counters) if OUTPUT.endswith(".trace.json") else \
+            {"spans": events, "counters": dict(counters)}
+        with open(OUTPUT, "w") as f:
+            json.dump(data, f, indent=1)
+        print(f"[profile] Spans written to {OUTPUT}")
+
+# Workers (and scripts started with SEDUCER_PROFILE set) switch on at import
+if os.environ.get(ENV_FLAG):
+    enable(None if os.environ[ENV_FLAG] == "1" else os.environ[ENV_FLAG])
@@ -0,0 +1,76 @@
+import os
+import json
+import numpy as np
+from wavstream import StreamingWavWriter
+
+# --- STEMS ---
+# app.py --stems keeps each instrument group as its own float32 .npy next to the mix,
+# so levels can be changed later (mic.py) without synthesizing anything again.
+# Stems are memory-mapped, so mixing them down never holds a whole track in RAM.
+
+STEM_CHUNK = 1 << 20 # Samples per mixdown chunk
+HEADROOM = 0.95      # Same as app.py's write_track
+
+def stem_path(wav_path, group):
+    return f"{os.path.splitext(wav_path)[0]}.{group}.npy"
+
+def manifest_path(wav_path):
+    return os.path.splitext(wav_path)[0] + ".stems.json"
+
+def create_stems(wav_path, groups, total_samples, sample_rate):
+    """Allocates a zeroed float32 stem file per group and the manifest that lists them."""
+    paths = {}
+    for group in groups:
+        paths[group] = stem_path(wav_path, group)
+        np.lib.format.open_memmap(paths[group], mode="w+", dtype=np.float32, shape=(total_samples,)).flush()
+    with open(manifest_path(wav_path), "w") as f:
+        json.dump({"sample_rate": sample_rate,
+                   "stems": {group: os.path.basename(p) for group, p in paths.items()}}, f, indent=2)
+    return paths
+
+def load_stems(wav_path):
+    """Returns (sample_rate, {group: memory-mapped stem}), or None if the track has no stems."""
+    try:
+        with open(manifest_path(wav_path)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    folder = os.path.dirname(wav_path)
+    stems = {group: np.load(os.path.join(folder, name), mmap_mode="r")
+             for group, name in manifest["stems"].items()}
+    return manifest["sample_rate"], stems
+
+def mix_chunks(stems, levels=None):
+    """Yields the level-weighted sum of the stems, STEM_CHUNK samples at a time."""
+    levels = levels or {}
+    total = min(len(stem) for stem in stems.values())
+    for start in range(0, total, STEM_CHUNK):
+        chunk = np.zeros(min(STEM_CHUNK, total - start))
+        for group, stem in stems.items():
+            chunk += levels.get(group, 1.0) * stem[start:start + len(chunk)]
+        yield chunk
+
+def mixdown_gain(stems, levels=None):
+    peak = max((np.max(np.abs(chunk)) for chunk in mix_chunks(stems, levels)), default=0.0)
+    return HEADROOM / peak if peak > 0 else 1.0
+
+def mixdown(stems, levels=None):
+    """The whole mix in memory, normalized like a rendered track."""
+    chunks = list(mix_chunks(stems, levels))
+    mix = np.concatenate(chunks) if chunks else np.zeros(0)
+    peak = np.max(np.abs(mix)) if len(mix) else 0.0
+    return mix * (HEADROOM / peak) if peak > 0 else mix
+
+def write_mixdown(filename, stems, sample_rate, levels=None, wav_format="int16", on_block=None):
+    """
+    Two passes over the memory-mapped stems: one for the peak, one to write.
+    on_block(block) sees every normalized block as it is written. Returns the gain applied.
+    """
+    gain = mixdown_gain(stems, levels)
+    with StreamingWavWriter(filename, sample_rate, dtype=wav_format) as wav:
+        for chunk in mix_chunks(stems, levels):
+            chunk *= gain
+            wav.write(chunk)
+            if on_block:
+                on_block(chunk)
+    return gain
@@ -1,61 +1,434 @@
-import pygame
 import librosa
 import numpy as np
 import cv2
+import os
 import sys
+import time
 import random
-import tkinter as tk
-from tkinter import filedialog
-import math
+import argparse
+import json
+import hashlib
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import subprocess
+import tempfile
+from collections import OrderedDict
+from library import find_track, describe
+import profiling
 
 # --- CONFIGURATION ---
+# Default output size and frame rate: --width/--height/--fps (or --preview) choose per render
 WIDTH, HEIGHT = 1280, 720
 FPS = 30
+PREVIEW_WIDTH, PREVIEW_HEIGHT = 640, 360
+PREVIEW_FPS = 15
 
+# Muxing straight to a finished MP4 needs a local ffmpeg
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+FFMPEG_ERROR_LINES = 10  # How much of ffmpeg's stderr to show when it fails
+
+# Blob sprite cache: radius is snapped to whole pixels, colour to steps of 4 per channel
+SPRITE_COLOR_STEP = 4
+SPRITE_CACHE_BYTES = 64 * 1024 * 1024
+
+# --- AUDIO ANALYSIS ---
+# Features are cached on disk by file contents, so re-rendering the same song skips librosa entirely.
+FEATURE_CACHE_DIR = os.environ.get(
+    "SEDUCER_FEATURE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "the-seducer", "features"))
+FEATURE_CACHE_BYTES = 256 * 1024 * 1024
+FEATURE_VERSION = 3  # Bump when the analysis below changes, so stale cache entries are ignored
+STREAM_BLOCK_FRAMES = 256  # Analysis frames per block when streaming a file from disk
+ANALYSIS_TOLERANCE = 0.02  # --check-analysis: most the streamed and decoded Song Signatures may differ
+
+def normalize(values):
+    """Scales to 0.0 - 1.0 (a flat signal becomes all zeros instead of NaN)."""
+    span = np.max(values) - np.min(values)
+    if span == 0:
+        return np.zeros_like(values)
+    return (values - np.min(values)) / span
+
+def feature_cache_key(file_path, sr, hop):
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    hasher.update(f"|sr={sr}|hop={hop}|v={FEATURE_VERSION}".encode())
+    return hasher.hexdigest()
+
+def load_cached_features(key):
+    path = os.path.join(FEATURE_CACHE_DIR, f"{key}.npz")
+    try:
+        with np.load(path) as data:
+            features = (data["rms"], data["centroid"], float(data["duration"]), float(data["avg_pitch"]))
+    except (OSError, KeyError, ValueError):
+        return None
+    try:
+        os.utime(path)  # Mark as recently used for eviction
+    except OSError:
+        pass  # Evicted by another render since we read it; we have the features anyway
+    return features
+
+def store_cached_features(key, rms, centroid, duration, avg_pitch):
+    os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+    path = os.path.join(FEATURE_CACHE_DIR, f"{key}.npz")
+    # Write then rename, so a crash never leaves a half-written entry behind
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, rms=rms, centroid=centroid, duration=duration, avg_pitch=avg_pitch)
+    os.replace(tmp_path, path)
+    evict_feature_cache()
+
+def evict_feature_cache(max_bytes=FEATURE_CACHE_BYTES):
+    """Deletes the least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    # Batch renders evict concurrently, so any entry may vanish under us: skip it, it's gone either way
+    for name in os.listdir(FEATURE_CACHE_DIR):
+        if name.endswith(".npz") and ".tmp" not in name:
+            try:
+                stat = os.stat(os.path.join(FEATURE_CACHE_DIR, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(FEATURE_CACHE_DIR, name))
+        except OSError:
+            pass
+        total -= size
+
+def stream_features(file_path, sr, hop):
+    """
+    Raw RMS and spectral centroid, read from disk a block at a time so long mixes never sit in memory.
+    librosa.stream can't resample, so we analyse at the file's own rate with the FFT and hop scaled
+    to keep the same time resolution as hop samples at sr. The centroid ignores everything above
+    sr's Nyquist, which resampling to sr (as load_features does) would have filtered out.
+    """
+    native_sr = librosa.get_samplerate(file_path)
+    n_fft = int(round(2048 * native_sr / sr))
+    hop_native = int(round(hop * native_sr / sr))
+    freqs = librosa.fft_frequencies(sr=native_sr, n_fft=n_fft)
+    audible = freqs <= sr / 2
+
+    # fill_value pads the last block out to a whole block of frames: only keep the frames that lie in the file
+    duration = librosa.get_duration(path=file_path)
+    num_samples = int(round(duration * native_sr))
+    num_frames = max(1, 1 + (num_samples - n_fft) // hop_native)
+
+    rms_blocks, centroid_blocks = [], []
+    for block in librosa.stream(file_path, block_length=STREAM_BLOCK_FRAMES, frame_length=n_fft,
+                                hop_length=hop_native, mono=True, fill_value=0):
+        rms_blocks.append(librosa.feature.rms(y=block, frame_length=n_fft, hop_length=hop_native,
+                                              center=False)[0])
+        spectrum = np.abs(librosa.stft(block, n_fft=n_fft, hop_length=hop_native, center=False))[audible]
+        centroid_blocks.append(librosa.feature.spectral_centroid(S=spectrum, freq=freqs[audible])[0])
+    rms = np.concatenate(rms_blocks)[:num_frames]
+    centroid = np.concatenate(centroid_blocks)[:num_frames]
+
+    # Streamed frames start at the first sample, centered ones (load_features) half a window earlier:
+    # hold the edge values so both paths line up frame for frame
+    lead = min(n_fft // 2 // hop_native, num_frames)
+    trail = max(0, 1 + num_samples // hop_native - lead - num_frames)
+    return np.pad(rms, (lead, trail), mode="edge"), np.pad(centroid, (lead, trail), mode="edge"), duration
+
+def load_features(file_path, sr, hop):
+    """Raw RMS and spectral centroid with the whole file decoded in memory."""
+    y, sr = librosa.load(file_path, sr=sr)
+
+    # 1. Volume
+    rms = librosa.feature.rms(y=y, hop_length=hop)[0]
+
+    # 2. Pitch (Brightness)
+    centroid = librosa.feature.spectral_centroid(y=y, sr=sr, hop_length=hop)[0]
+    return rms, centroid, librosa.get_duration(y=y, sr=sr)
+
+def check_analysis(file_path, sr=22050, hop=512):
+    """Analyses file_path both streamed and fully decoded. Returns True if the two agree."""
+    rms_s, centroid_s, _ = stream_features(file_path, sr, hop)
+    rms_l, centroid_l, _ = load_features(file_path, sr, hop)
+    n = min(len(centroid_s), len(centroid_l))
+    centroid_s, centroid_l = normalize(centroid_s), normalize(centroid_l)
+    pitch_s, pitch_l = float(np.mean(centroid_s)), float(np.mean(centroid_l))
+    agree = abs(pitch_s - pitch_l) <= ANALYSIS_TOLERANCE
+    print(f"{os.path.basename(file_path)}: {len(centroid_s)} streamed / {len(centroid_l)} decoded frames, "
+          f"Song Signature {pitch_s:.3f} streamed / {pitch_l:.3f} decoded, "
+          f"centroid correlation {np.corrcoef(centroid_s[:n], centroid_l[:n])[0, 1]:.3f} "
+          f"-> {'OK' if agree else 'MISMATCH'}")
+    return agree
+
+def sidecar_path(file_path):
+    """Where app.py leaves the features it recorded while rendering a track."""
+    return os.path.splitext(file_path)[0] + ".features.npz"
+
+def load_sidecar_features(file_path):
+    """Normalized features from app.py's sidecar, or None if the song doesn't have one."""
+    try:
+        with np.load(sidecar_path(file_path)) as data:
+            rms, centroid, duration = data["rms"], data["centroid"], float(data["duration"])
+    except (OSError, KeyError, ValueError):
+        return None
+    centroid = normalize(centroid)
+    return normalize(rms), centroid, duration, float(np.mean(centroid))
+
+@profiling.profiled()
+def analyze_audio(file_path, sr=22050, hop=512):
+    """Returns normalized (rms, centroid), duration in seconds and the song's average pitch."""
+    # Tracks from app.py come with their features already written down
+    sidecar = load_sidecar_features(file_path)
+    if sidecar is not None:
+        print(f"Color Palette read from the track's sidecar. Song Signature: {sidecar[3]:.2f}")
+        profiling.count("sidecar_features")
+        return sidecar
+
+    key = None
+    if FEATURE_CACHE_DIR:
+        key = feature_cache_key(file_path, sr, hop)
+        cached = load_cached_features(key)
+        if cached is not None:
+            print(f"Color Palette loaded from cache. Song Signature: {cached[3]:.2f}")
+            profiling.count("feature_cache_hits")
+            return cached
+
+    print("Listening to the song to determine its 'Color Palette'...")
+    try:
+        rms, centroid, duration = stream_features(file_path, sr, hop)
+    except Exception as e:
+        # Formats libsndfile can't stream (older builds and mp3) go through the full decoder
+        print(f"Streaming analysis unavailable ({e}); decoding the whole file...")
+        rms, centroid, duration = load_features(file_path, sr, hop)
+    profiling.current().audio_seconds = duration
+
+    # Normalize (0.0 to 1.0)
+    rms = normalize(rms)
+    centroid = normalize(centroid)
+
+    # 3. Determine Song "Signature" (Average Pitch)
+    avg_pitch = float(np.mean(centroid))
+    print(f"Song Signature Detected: {avg_pitch:.2f}")
+
+    if key:
+        store_cached_features(key, rms, centroid, duration, avg_pitch)
+    return rms, centroid, duration, avg_pitch
+
+class FFmpegWriter:
+    """
+    Drop-in for cv2.VideoWriter that pipes raw BGR frames into ffmpeg.
+    ffmpeg encodes H.264 and muxes the song in the same pass, so there is no second re-encode.
+    """
+    def __init__(self, output_file, audio_file, fps=FPS, size=(WIDTH, HEIGHT)):
+        cmd = [
+            FFMPEG_BINARY, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-",
+            "-i", audio_file,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac",
+            "-shortest", output_file,
+        ]
+        # stderr goes to a file, not a pipe: nobody reads it while frames are going in
+        self.log = tempfile.TemporaryFile()
+        self.returncode = None
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self.log)
+        except FileNotFoundError:
+            self.log.close()
+            raise RuntimeError(f"ffmpeg not found (looked for '{FFMPEG_BINARY}'). Install it or set FFMPEG_BINARY.")
+
+    def write(self, frame):
+        if self.returncode is not None:
+            return  # ffmpeg finished cleanly already (-shortest: the song ended before the frames)
+        try:
+            self.proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            self.release()  # ffmpeg quit early (bad codec, disk full...): raises with its own explanation
+
+    def release(self):
+        if self.returncode is not None:
+            return
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass  # Unflushed frames had nowhere to go; the exit code below says why
+        self.returncode = self.proc.wait()
+        self.log.seek(0)
+        errors = self.log.read().decode(errors="replace").strip().splitlines()[-FFMPEG_ERROR_LINES:]
+        self.log.close()
+        if self.returncode != 0:
+            details = "\n".join(errors) or "(no error output)"
+            raise RuntimeError(f"ffmpeg exited with code {self.returncode}:\n{details}")
+
+def open_video_writer(output_file, audio_file=None, fps=FPS, size=(WIDTH, HEIGHT)):
+    """Silent mp4v through OpenCV, or a finished MP4 with sound through ffmpeg when audio_file is given."""
+    if audio_file:
+        return FFmpegWriter(output_file, audio_file, fps, size)
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(output_file, fourcc, fps, size)
+
+class BlobSpriteCache:
+    """
+    Keeps pre-rendered glow sprites so a frame only touches the pixels under the blob.
+    Sprites are keyed by quantized radius and colour; the least recently used are dropped
+    once the cache grows past max_bytes.
+    make_sprite(radius, rgb) builds a sprite and returns (sprite, size_in_bytes).
+    """
+    def __init__(self, make_sprite, max_bytes=SPRITE_CACHE_BYTES):
+        self.make_sprite = make_sprite
+        self.max_bytes = max_bytes
+        self.sprites = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, radius, rgb):
+        radius = max(1, round(radius))
+        rgb = tuple(min(255, round(c / SPRITE_COLOR_STEP) * SPRITE_COLOR_STEP) for c in rgb)
+        key = (radius, rgb)
+
+        entry = self.sprites.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+            return entry[0]
+
+        self.misses += 1
+        sprite, size = self.make_sprite(radius, rgb)
+        self.sprites[key] = (sprite, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes and len(self.sprites) > 1:
+            _, (_, old_size) = self.sprites.popitem(last=False)
+            self.bytes -= old_size
+        return sprite
+
+# --- BRUSH TRAJECTORY ---
+# The brush path is worked out once, from the audio features and a seed, before anything is drawn.
+# It moves at PHYSICS_RATE steps per second of audio whatever the output frame rate, in canvas-relative
+# units (x and y from 0 to 1, radius as a fraction of the height). So a 640x360 preview at 15 FPS and
+# a 4K render at 30 FPS with the same seed paint the same picture: each frame stamps every step
+# the brush has taken since the previous frame. Above PHYSICS_RATE there is no new step for every
+# frame, so higher frame rates only repeat frames (the brush rules are tuned per step, so the
+# rate can't simply be raised without changing every painting).
+PHYSICS_RATE = 30
+PHYSICS_WIDTH, PHYSICS_HEIGHT = 1280, 720 # The units the brush rules were tuned in
+
+# Sector table for HSV -> RGB: which of (chroma, second, zero) lands in R, G, B
+HSV_SECTORS = np.array([[0, 1, 2], [1, 0, 2], [2, 0, 1], [2, 1, 0], [1, 2, 0], [0, 2, 1]])
+
+def hsv_to_rgb(hue, sat, val):
+    """Vectorized pygame-style HSV (0-360, 0-100, 0-100) to RGB floats (0-255), shape (..., 3)."""
+    hue = np.asarray(hue, dtype=np.float64) % 360 / 60
+    sat = np.asarray(sat, dtype=np.float64) / 100
+    val = np.asarray(val, dtype=np.float64) / 100
+    chroma = val * sat
+    second = chroma * (1 - np.abs(hue % 2 - 1))
+    parts = np.stack([chroma, second, np.zeros_like(chroma)], axis=-1)
+    sector = np.floor(hue).astype(int) % 6
+    rgb = np.take_along_axis(parts, HSV_SECTORS[sector], axis=-1)
+    return (rgb + (val - chroma)[..., None]) * 255
+
+def frame_features(rms, pitch_data, duration, num_steps, rate=PHYSICS_RATE):
+    """Picks the analysis value under each brush step (step n is time n / rate)."""
+    total_frames = len(rms)
+    times = np.arange(num_steps) / rate
+    idx = np.minimum((times / duration * total_frames).astype(int), total_frames - 1)
+    return rms[idx], pitch_data[idx]
+
+def fold(pos, size):
+    """Reflects an unbounded path back into [0, size], like a ball bouncing off both walls."""
+    pos = np.mod(pos, 2 * size)
+    return np.where(pos > size, 2 * size - pos, pos)
+
+def compute_trajectory(rms, pitch_data, duration, seed):
+    """
+    The brush physics for every step of the song at once.
+    Returns canvas-relative x, y and radius and the RGB colour of each step.
+    """
+    num_steps = int(duration * PHYSICS_RATE)
+    vol, pitch = frame_features(rms, pitch_data, duration, num_steps)
+    rng = np.random.default_rng(seed)
+
+    # 1. Size: Louder = Bigger
+    radius = 5 + (vol * 120)
+
+    # 2. Color: Base hue comes from the pitch.
+    # If it's loud, push saturation down (Whiter/Brighter)
+    # If it's quiet, high saturation (Deep colors)
+    rgb = hsv_to_rgb(pitch * 360, 100 - (vol * 50), 50 + (vol * 50))
+
+    # 3. Movement
+    # Volume affects "swerves". Loud = sharp turns.
+    turn_speed = 0.1 + (vol * 0.5)
+    angle = np.cumsum(rng.uniform(-turn_speed, turn_speed))
+    # Speed is pure volume; pitch affects "nervousness". High pitch = jittery brush.
+    step = 2 + (vol * 30)
+    jitter = pitch * 10
+    dx = np.cos(angle) * step + rng.uniform(-jitter, jitter)
+    dy = np.sin(angle) * step + rng.uniform(-jitter, jitter)
+
+    # Walls: walk the path unbounded, then fold it back between the walls (a mirror bounce)
+    x = fold(PHYSICS_WIDTH // 2 + np.cumsum(dx), PHYSICS_WIDTH) / PHYSICS_WIDTH
+    y = fold(PHYSICS_HEIGHT // 2 + np.cumsum(dy), PHYSICS_HEIGHT) / PHYSICS_HEIGHT
+    return x, y, radius / PHYSICS_HEIGHT, rgb
+
+def scale_trajectory(trajectory, width, height):
+    """A canvas-relative trajectory in pixels: integer x, y, radius in pixels and RGB."""
+    x, y, radius, rgb = trajectory
+    return (x * width).astype(int), (y * height).astype(int), radius * height, rgb
+
+def frame_schedule(num_steps, duration, fps):
+    """How many brush steps are on the canvas by each video frame (frame n is time n / fps)."""
+    frames = np.arange(1, int(duration * fps) + 1)
+    return np.minimum(frames * PHYSICS_RATE // fps, num_steps)
+
+def pick_seed(seed=None):
+    return random.randrange(2**32) if seed is None else seed
+
+def painting_path(output_file):
+    return os.path.splitext(output_file)[0] + ".painting.json"
+
+def write_painting(output_file, audio_file, seed, width, height, fps):
+    """Records what a video was painted from, so --seed-from can paint it again at any size."""
+    with open(painting_path(output_file), "w") as f:
+        json.dump({"audio": os.path.abspath(audio_file), "seed": seed, "physics_rate": PHYSICS_RATE,
+                   "width": width, "height": height, "fps": fps}, f, indent=2)
+
+# The pygame backend. pygame is imported inside its methods, so the NumPy backend, the analysis
+# and everything else here run on boxes without pygame or SDL.
 class ArtGen:
-    def __init__(self):
+    def __init__(self, headless=False, mux=False, seed=None, width=WIDTH, height=HEIGHT, fps=FPS):
+        self.headless = headless
+        self.mux = mux
+        self.seed = pick_seed(seed)
+        self.width, self.height, self.fps = width, height, fps
+        if headless:
+            # SDL's dummy drivers let pygame run on a box with no screen or sound card
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        import pygame
         pygame.init()
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        pygame.display.set_caption("Abstract Audio Painter")
+        if headless:
+            # Off-screen canvas: nothing is shown, every frame goes straight to the encoder
+            self.screen = pygame.Surface((width, height))
+        else:
+            self.screen = pygame.display.set_mode((width, height))
+            pygame.display.set_caption("Abstract Audio Painter")
         self.clock = pygame.time.Clock()
         
-        # Physics
-        self.brush_x = WIDTH // 2
-        self.brush_y = HEIGHT // 2
-        self.angle = 0
-        self.velocity = 0
-        
         # Video Saver
         self.video_writer = None
 
+        # Pre-rendered blobs
+        self.sprites = BlobSpriteCache(self.make_blob_sprite)
+
     def select_file(self):
+        # Imported here so headless boxes without Tk can still render
+        import tkinter as tk
+        from tkinter import filedialog
         root = tk.Tk()
         root.withdraw()
         file_path = filedialog.askopenfilename(filetypes=[("Audio Files", "*.wav *.mp3")])
         if not file_path: sys.exit()
         return file_path
 
-    def analyze_audio(self, file_path):
-        print("Listening to the song to determine its 'Color Palette'...")
-        y, sr = librosa.load(file_path, sr=22050)
-        
-        # 1. Volume
-        hop = 512
-        rms = librosa.feature.rms(y=y, hop_length=hop)[0]
-        
-        # 2. Pitch (Brightness)
-        centroid = librosa.feature.spectral_centroid(y=y, sr=sr, hop_length=hop)[0]
-        
-        # Normalize (0.0 to 1.0)
-        rms = (rms - np.min(rms)) / (np.max(rms) - np.min(rms))
-        centroid = (centroid - np.min(centroid)) / (np.max(centroid) - np.min(centroid))
-        
-        # 3. Determine Song "Signature" (Average Pitch)
-        avg_pitch = np.mean(centroid)
-        print(f"Song Signature Detected: {avg_pitch:.2f}")
-        
-        return y, sr, rms, centroid, librosa.get_duration(y=y, sr=sr), avg_pitch
-
     def draw_gradient_blob(self, surface, x, y, radius, color):
         """
         Draws a soft, glowing circle instead of a flat one.
@@ -64,6 +437,7 @@ class ArtGen:
         2. Middle: Medium, semi-transparent
         3. Inner: Small, opaque (The Core)
         """
+        import pygame
         # Layer 1: The Glow
         glow_radius = int(radius * 1.5)
         glow_color = (color.r, color.g, color.b, 20) # Very faint
@@ -79,14 +453,19 @@ class ArtGen:
         core_color = (min(color.r + 50, 255), min(color.g + 50, 255), min(color.b + 50, 255), 100)
         pygame.draw.circle(surface, core_color, (x, y), core_radius)
 
-    def run(self):
-        file_path = self.select_file()
-        y, sr, rms, pitch_data, duration, avg_pitch = self.analyze_audio(file_path)
-        
+    def make_blob_sprite(self, radius, rgb):
+        import pygame
+        # The glow is the widest layer, so the sprite is a square around it
+        half = int(radius * 1.5) + 1
+        sprite = pygame.Surface((2 * half, 2 * half), pygame.SRCALPHA)
+        self.draw_gradient_blob(sprite, half, half, radius, pygame.Color(*rgb))
+        return sprite, sprite.get_width() * sprite.get_height() * 4
+
+    def prepare_canvas(self, avg_pitch, output_file, file_path):
+        import pygame
         # --- SETUP VIDEO ---
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        output_file = "Abstract_Masterpiece.mp4"
-        self.video_writer = cv2.VideoWriter(output_file, fourcc, FPS, (WIDTH, HEIGHT))
+        self.video_writer = open_video_writer(output_file, file_path if self.mux else None,
+                                              self.fps, (self.width, self.height))
         
         # --- SETUP BACKGROUND THEME ---
         # If song is deep (avg_pitch < 0.3): Dark Purple background
@@ -96,14 +475,56 @@ class ArtGen:
         bg_color.hsva = (bg_hue, 60, 10, 100) # Dark, saturated background
         self.screen.fill(bg_color)
 
+    def plan(self, file_path, output_file):
+        """Listens to the song, sets up the canvas and returns the brush trajectory in pixels and the duration."""
+        rms, pitch_data, duration, avg_pitch = analyze_audio(file_path)
+        self.prepare_canvas(avg_pitch, output_file, file_path)
+        write_painting(output_file, file_path, self.seed, self.width, self.height, self.fps)
+        trajectory = compute_trajectory(rms, pitch_data, duration, self.seed)
+        return scale_trajectory(trajectory, self.width, self.height), duration
+
+    def paint_steps(self, trajectory, start, stop):
+        """
+        Paints brush steps [start, stop) of a pixel trajectory.
+        Returns the rects that changed on screen.
+        """
+        xs, ys, radii, colors = trajectory
+        dirty = []
+        for step in range(start, stop):
+            # The blob is pre-rendered on its own small transparent sprite (alpha blends correctly),
+            # so we only blit the square around the brush instead of a whole screen-sized layer.
+            sprite = self.sprites.get(radii[step], colors[step])
+            half = sprite.get_width() // 2
+            dirty.append(self.screen.blit(sprite, (int(xs[step]) - half, int(ys[step]) - half)))
+        return dirty
+
+    def save_frame(self):
+        import pygame
+        # --- SAVE VIDEO FRAME ---
+        with profiling.span("frame_convert"):
+            view = pygame.surfarray.array3d(self.screen)
+            view = view.transpose([1, 0, 2])
+            view = cv2.cvtColor(view, cv2.COLOR_RGB2BGR)
+        with profiling.span("encode"):
+            self.video_writer.write(view)
+        profiling.count("frames_written")
+
+    def run(self, file_path=None, output_file="Abstract_Masterpiece.mp4"):
+        import pygame
+        if file_path is None:
+            file_path = self.select_file()
+        trajectory, duration = self.plan(file_path, output_file)
+        num_steps = len(trajectory[0])
+        pygame.display.flip()
+
         pygame.mixer.music.load(file_path)
         pygame.mixer.music.play()
         start_time = pygame.time.get_ticks()
 
         running = True
-        total_frames = len(rms)
+        painted = 0
         
-        print(f"Painting... (Press Ctrl+C in terminal to stop early)")
+        print(f"Painting with seed {self.seed}... (Press Ctrl+C in terminal to stop early)")
 
         while running:
             for event in pygame.event.get():
@@ -111,80 +532,363 @@ class ArtGen:
 
             # Time Sync
             curr_time = (pygame.time.get_ticks() - start_time) / 1000.0
-            idx = int((curr_time / duration) * total_frames)
-            
-            if idx >= total_frames:
+            if curr_time >= duration:
                 running = False
                 break
 
-            # --- DATA FOR THIS FRAME ---
-            vol = rms[idx]         # 0.0 (Quiet) to 1.0 (Loud)
-            pitch = pitch_data[idx] # 0.0 (Deep) to 1.0 (High)
-
-            # --- BRUSH PHYSICS ---
-            # 1. Size: Louder = Bigger
-            target_radius = 5 + (vol * 120)
-            
-            # 2. Color: Complex Mixing
-            # Base hue comes from the pitch.
-            # We add a "twist" so the color evolves over time.
-            base_hue = (pitch * 360) 
-            # If it's loud, push saturation down (Whiter/Brighter)
-            # If it's quiet, high saturation (Deep colors)
-            saturation = 100 - (vol * 50) 
-            brightness = 50 + (vol * 50)
-            
-            color = pygame.Color(0)
-            color.hsva = (base_hue, saturation, brightness, 100)
-
-            # 3. Movement
-            # Pitch affects "nervousness". High pitch = jittery brush.
-            jitter = (pitch * 10) 
-            
-            # Volume affects "swerves". Loud = sharp turns.
-            turn_speed = 0.1 + (vol * 0.5)
-            self.angle += random.uniform(-turn_speed, turn_speed)
-            
-            # Speed is pure volume
-            step = 2 + (vol * 30)
-
-            self.brush_x += math.cos(self.angle) * step + random.uniform(-jitter, jitter)
-            self.brush_y += math.sin(self.angle) * step + random.uniform(-jitter, jitter)
-
-            # Wall Bounce (Instead of teleporting, let's bounce for smoother lines)
-            if self.brush_x < 0 or self.brush_x > WIDTH:
-                self.angle = math.pi - self.angle # Reflect X
-                self.brush_x = max(0, min(WIDTH, self.brush_x))
-            if self.brush_y < 0 or self.brush_y > HEIGHT:
-                self.angle = -self.angle # Reflect Y
-                self.brush_y = max(0, min(HEIGHT, self.brush_y))
-
-            # --- DRAWING ---
-            # We draw to a transparent surface first to handle alpha blending correctly
-            temp_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            
-            # Use our gradient function
-            draw_x = int(self.brush_x)
-            draw_y = int(self.brush_y)
-            self.draw_gradient_blob(temp_surf, draw_x, draw_y, target_radius, color)
-            
-            # Blit the temp surface onto the main screen
-            self.screen.blit(temp_surf, (0, 0))
-
-            pygame.display.flip()
-
-            # --- SAVE VIDEO FRAME ---
-            view = pygame.surfarray.array3d(self.screen)
-            view = view.transpose([1, 0, 2])
-            view = cv2.cvtColor(view, cv2.COLOR_RGB2BGR)
-            self.video_writer.write(view)
+            # Catch the brush up with the music, then only push the pixels it touched to the window
+            target = min(int(curr_time * PHYSICS_RATE) + 1, num_steps)
+            dirty = self.paint_steps(trajectory, painted, target)
+            painted = target
+            pygame.display.update(dirty)
+            self.save_frame()
 
-            self.clock.tick(FPS)
+            self.clock.tick(self.fps)
 
         self.video_writer.release()
         pygame.quit()
-        print(f"Masterpiece saved: {output_file}")
+        print(f"Masterpiece saved: {output_file} (seed in {painting_path(output_file)})")
+
+    def render_offline(self, file_path, output_file="Abstract_Masterpiece.mp4"):
+        """
+        Renders the whole song as fast as the CPU allows.
+        Instead of asking the clock where the music is, we step a fixed frame clock:
+        frame n is time n / fps, so every frame is painted exactly once, never dropped or doubled.
+        """
+        import pygame
+        trajectory, duration = self.plan(file_path, output_file)
+        schedule = frame_schedule(len(trajectory[0]), duration, self.fps)
+        num_video_frames = len(schedule)
+        
+        print(f"Painting {num_video_frames} frames offline at {self.width}x{self.height}, "
+              f"{self.fps} FPS (seed {self.seed})...")
+        render_start = time.perf_counter()
+
+        painted = 0
+        with profiling.span("render_frames", audio_seconds=duration):
+            for target in schedule:
+                with profiling.span("paint"):
+                    self.paint_steps(trajectory, painted, target)
+                painted = target
+                self.save_frame()
+
+        elapsed = time.perf_counter() - render_start
+        self.video_writer.release()
+        pygame.quit()
+
+        fps = num_video_frames / elapsed if elapsed > 0 else float("inf")
+        print(f"Rendered {num_video_frames} frames in {elapsed:.1f}s "
+              f"({fps:.1f} fps, {fps / self.fps:.2f}x realtime)")
+        print(f"Blob sprites: {self.sprites.hits} reused, {self.sprites.misses} drawn")
+        print(f"Masterpiece saved: {output_file} (seed in {painting_path(output_file)})")
+
+# --- NUMPY BACKEND ---
+# Same trajectory and blobs as ArtGen, but the blobs are blended straight into
+# a BGR uint8 canvas that cv2 can encode as-is.
+
+def make_blob_stamp(radius, rgb):
+    """
+    The three-layer glow from ArtGen.draw_gradient_blob as arrays:
+    premultiplied BGR colour and (1 - alpha), both float32 and centred on the brush.
+    """
+    glow_radius = int(radius * 1.5)
+    body_radius = int(radius)
+    core_radius = int(radius * 0.4)
+
+    yy, xx = np.ogrid[-glow_radius:glow_radius + 1, -glow_radius:glow_radius + 1]
+    dist2 = xx * xx + yy * yy
+
+    # Inner layers overwrite outer ones, exactly like drawing the circles in order
+    alpha = np.zeros(dist2.shape, dtype=np.float32)
+    alpha[dist2 <= glow_radius ** 2] = 20 / 255
+    alpha[dist2 <= body_radius ** 2] = 50 / 255
+    core = dist2 <= core_radius ** 2
+    alpha[core] = 100 / 255
+
+    bgr = np.array(rgb[::-1], dtype=np.float32)
+    color = np.broadcast_to(bgr, alpha.shape + (3,)).copy()
+    color[core] = np.minimum(bgr + 50, 255)
+
+    premult = color * alpha[..., None]
+    keep = (1 - alpha)[..., None]
+    return (premult, keep), premult.nbytes + keep.nbytes
+
+def composite_blob(canvas, x, y, stamp, top=0):
+    """
+    Blends a stamp into canvas with its centre at (x, y).
+    canvas may be a horizontal band of the frame starting at row `top`.
+    """
+    premult, keep = stamp
+    half = premult.shape[0] // 2
+    height, width = canvas.shape[:2]
+    x0, x1 = max(0, x - half), min(width, x + half + 1)
+    y0, y1 = max(0, y - half - top), min(height, y + half + 1 - top)
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    sx, sy = x0 - (x - half), y0 - (y - half - top)
+    region = canvas[y0:y1, x0:x1]
+    blended = region * keep[sy:sy + y1 - y0, sx:sx + x1 - x0] + premult[sy:sy + y1 - y0, sx:sx + x1 - x0]
+    region[...] = (blended + 0.5).astype(np.uint8)
+
+def paint_steps(canvas, trajectory, start, stop, stamps, top=0):
+    """Blends brush steps [start, stop) of a pixel trajectory into canvas (or a band of it starting at row `top`)."""
+    xs, ys, radii, colors = trajectory
+    bottom = top + canvas.shape[0]
+    for step in range(start, stop):
+        # Skip blobs that can't reach the canvas before touching the stamp cache
+        reach = int(radii[step] * 1.5) + 1
+        if top - reach <= ys[step] < bottom + reach:
+            composite_blob(canvas, xs[step], ys[step], stamps.get(radii[step], colors[step]), top)
+
+# Tile workers hand finished frames over in batches, double-buffered in shared memory
+FRAME_BATCH = 8
+TILE_POLL_SECONDS = 0.5     # How often the main process checks that every tile worker is still alive
+TILE_TIMEOUT_SECONDS = 600  # Longest we wait for one batch before giving up on the workers
+
+@profiling.profiled()
+def paint_band(shm_name, top, bottom, size, trajectory, schedule, bg_bgr, painted_sem, free_sem):
+    """
+    Worker process: owns rows [top, bottom) of the canvas, paints every blob that touches them
+    and copies its band into the shared frame slots, one batch of frames at a time.
+    Releases painted_sem after each batch and waits on free_sem before reusing a half of the buffer.
+    """
+    width, height = size
+    num_video_frames = len(schedule)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        slots = np.ndarray((2, FRAME_BATCH, height, width, 3), dtype=np.uint8, buffer=shm.buf)
+        stamps = BlobSpriteCache(make_blob_stamp)
+
+        band = np.empty((bottom - top, width, 3), dtype=np.uint8)
+        band[...] = bg_bgr
+
+        painted = 0
+        for batch, batch_start in enumerate(range(0, num_video_frames, FRAME_BATCH)):
+            half = batch % 2
+            # The main process must be done encoding what was last in this half
+            if batch >= 2 and not free_sem.acquire(timeout=TILE_TIMEOUT_SECONDS):
+                raise RuntimeError("Gave up waiting for the main process to free a frame batch.")
+            for frame in range(batch_start, min(batch_start + FRAME_BATCH, num_video_frames)):
+                paint_steps(band, trajectory, painted, schedule[frame], stamps, top)
+                painted = schedule[frame]
+                slots[half, frame - batch_start, top:bottom] = band
+            painted_sem.release()
+    finally:
+        del slots
+        shm.close()
+
+def wait_for_bands(painted_sems, procs):
+    """
+    Waits until every tile worker has painted its band of the next batch.
+    Raises as soon as a worker dies (even by a signal, which skips its own error handling) or stalls.
+    """
+    deadline = time.monotonic() + TILE_TIMEOUT_SECONDS
+    for sem in painted_sems:
+        while not sem.acquire(timeout=TILE_POLL_SECONDS):
+            codes = [p.exitcode for p in procs]
+            if any(code not in (None, 0) for code in codes):
+                raise RuntimeError(f"A tile worker died (exit codes {codes}; negative means killed by that signal).")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Tile workers stalled for {TILE_TIMEOUT_SECONDS}s (exit codes {codes}).")
+
+class NumpyPainter:
+    """Pygame-free renderer: precomputed trajectory, NumPy compositing, frames straight to cv2."""
+    def __init__(self, seed=None, workers=1, mux=False, width=WIDTH, height=HEIGHT, fps=FPS):
+        self.seed = pick_seed(seed)
+        self.workers = workers
+        self.mux = mux
+        self.width, self.height, self.fps = width, height, fps
+        self.stamps = BlobSpriteCache(make_blob_stamp)
+
+    def render(self, file_path, output_file="Abstract_Masterpiece.mp4", checksum=False):
+        rms, pitch_data, duration, avg_pitch = analyze_audio(file_path)
+        trajectory = scale_trajectory(compute_trajectory(rms, pitch_data, duration, self.seed),
+                                      self.width, self.height)
+        schedule = frame_schedule(len(trajectory[0]), duration, self.fps)
+        num_video_frames = len(schedule)
+        write_painting(output_file, file_path, self.seed, self.width, self.height, self.fps)
+
+        # Same dark background theme as ArtGen.prepare_canvas, stored as BGR
+        bg_bgr = np.round(hsv_to_rgb(int(avg_pitch * 240), 60, 10)[::-1]).astype(np.uint8)
+
+        video_writer = open_video_writer(output_file, file_path if self.mux else None,
+                                         self.fps, (self.width, self.height))
+        # Optional fingerprint of the raw frames, to check tiled renders against the single process
+        hasher = hashlib.sha256() if checksum else None
+
+        def emit(frame_pixels):
+            with profiling.span("encode"):
+                video_writer.write(frame_pixels)
+            profiling.count("frames_written")
+            if hasher:
+                hasher.update(frame_pixels.data)
+
+        print(f"Painting {num_video_frames} frames with NumPy at {self.width}x{self.height}, {self.fps} FPS "
+              f"(seed {self.seed}, {self.workers} worker{'s' if self.workers > 1 else ''})...")
+        render_start = time.perf_counter()
+
+        with profiling.span("render_frames", audio_seconds=duration):
+            if self.workers > 1:
+                self.paint_tiled(trajectory, schedule, bg_bgr, emit)
+            else:
+                self.paint_serial(trajectory, schedule, bg_bgr, emit)
+
+        elapsed = time.perf_counter() - render_start
+        video_writer.release()
+
+        fps = num_video_frames / elapsed if elapsed > 0 else float("inf")
+        print(f"Rendered {num_video_frames} frames in {elapsed:.1f}s "
+              f"({fps:.1f} fps, {fps / self.fps:.2f}x realtime)")
+        if hasher:
+            print(f"Frame checksum: {hasher.hexdigest()}")
+        print(f"Masterpiece saved: {output_file} (seed in {painting_path(output_file)})")
+
+    def paint_serial(self, trajectory, schedule, bg_bgr, emit):
+        canvas = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        canvas[...] = bg_bgr
+
+        painted = 0
+        for target in schedule:
+            with profiling.span("paint"):
+                paint_steps(canvas, trajectory, painted, target, self.stamps)
+            painted = target
+            emit(canvas)
+
+    def paint_tiled(self, trajectory, schedule, bg_bgr, emit):
+        """
+        Splits the canvas into horizontal bands, one per worker process.
+        Workers fill one half of a double buffer while we encode the other half, in frame order.
+        """
+        width, height = self.width, self.height
+        num_video_frames = len(schedule)
+        workers = min(self.workers, height)
+        bounds = np.linspace(0, height, workers + 1).astype(int)
+        shm = shared_memory.SharedMemory(create=True, size=2 * FRAME_BATCH * height * width * 3)
+        slots = np.ndarray((2, FRAME_BATCH, height, width, 3), dtype=np.uint8, buffer=shm.buf)
+        # One pair of semaphores per worker, so a fast band can't use up a slow band's turn
+        painted_sems = [mp.Semaphore(0) for _ in range(workers)]
+        free_sems = [mp.Semaphore(0) for _ in range(workers)]
+
+        procs = [mp.Process(target=paint_band,
+                            args=(shm.name, bounds[i], bounds[i + 1], (width, height), trajectory,
+                                  schedule, bg_bgr, painted_sems[i], free_sems[i]))
+                 for i in range(workers)]
+        try:
+            for p in procs:
+                p.start()
+
+            num_batches = -(-num_video_frames // FRAME_BATCH)
+            for batch in range(num_batches):
+                wait_for_bands(painted_sems, procs)
+                batch_start = batch * FRAME_BATCH
+                half = batch % 2
+                for frame in range(batch_start, min(batch_start + FRAME_BATCH, num_video_frames)):
+                    emit(slots[half, frame - batch_start])
+                # Done reading this half: workers may paint the batch after next into it
+                for sem in free_sems:
+                    sem.release()
+
+            for p in procs:
+                p.join()
+        finally:
+            for p in procs:
+                if p.is_alive():
+                    p.terminate()
+            del slots
+            shm.close()
+            shm.unlink()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Paints a video from a song.")
+    parser.add_argument("audio", nargs="*", help="Audio file(s) to paint (opens a file dialog if omitted)")
+    parser.add_argument("--latest", action="store_true", help="Paint the newest render in the track library")
+    parser.add_argument("--track-seed", type=int, help="Paint the newest render of this seed")
+    parser.add_argument("--bpm", type=int, help="Paint the newest render at this tempo")
+    parser.add_argument("--key", help="Paint the newest render in this key (e.g. F#)")
+    parser.add_argument("-o", "--output", default="Abstract_Masterpiece.mp4",
+                        help="Output video file (with several audio files: <song name>.mp4 in --out-dir)")
+    parser.add_argument("--out-dir", default=".", help="Where batch renders go")
+    parser.add_argument("--headless", action="store_true",
+                        help="Render offline as fast as possible, with no window or sound card")
+    parser.add_argument("--backend", choices=["pygame", "numpy"], default="pygame",
+                        help="numpy renders headless without pygame (implies --headless)")
+    parser.add_argument("--seed", type=int, help="Brush seed (default: random; saved next to the video as .painting.json)")
+    parser.add_argument("--seed-from", metavar="PAINTING_JSON",
+                        help="Paint again with the seed (and song) a video was made with, e.g. a preview")
+    parser.add_argument("--width", type=int, help=f"Frame width in pixels (default {WIDTH})")
+    parser.add_argument("--height", type=int, help=f"Frame height in pixels (default {HEIGHT})")
+    parser.add_argument("--fps", type=int,
+                        help=f"Frames per second (default {FPS}; above {PHYSICS_RATE} frames repeat, it's no smoother)")
+    parser.add_argument("--preview", action="store_true",
+                        help=f"Quick offline render at {PREVIEW_WIDTH}x{PREVIEW_HEIGHT}, {PREVIEW_FPS} FPS "
+                             "(the same painting as a full render with the same seed)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Paint with N processes, each owning a band of the frame (numpy backend)")
+    parser.add_argument("--checksum", action="store_true",
+                        help="Print a SHA-256 of the raw frames (numpy backend)")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-analyse the audio")
+    parser.add_argument("--check-analysis", action="store_true",
+                        help="Analyse each audio file both streamed and fully decoded, report whether they agree, and exit")
+    parser.add_argument("--mux", action="store_true",
+                        help="Pipe frames into ffmpeg and mux the song in, giving a finished H.264/AAC MP4")
+    parser.add_argument("--profile", nargs="?", const="", metavar="OUT",
+                        help="Time every stage; OUT.trace.json saves a Chrome trace, other .json paths plain JSON")
+    args = parser.parse_args()
+    if args.seed_from:
+        with open(args.seed_from) as f:
+            painting = json.load(f)
+        if args.seed is None:
+            args.seed = painting["seed"]
+        if not args.audio:
+            args.audio = [painting["audio"]]
+    default_size = (PREVIEW_WIDTH, PREVIEW_HEIGHT, PREVIEW_FPS) if args.preview else (WIDTH, HEIGHT, FPS)
+    args.width = args.width or default_size[0]
+    args.height = args.height or default_size[1]
+    args.fps = args.fps or default_size[2]
+    if args.fps > PHYSICS_RATE:
+        print(f"Note: the brush moves {PHYSICS_RATE} times a second, so at {args.fps} FPS frames repeat "
+              f"rather than look smoother.")
+    if args.preview:
+        args.headless = True
+    if not args.audio and (args.latest or args.track_seed is not None or args.bpm or args.key):
+        track = find_track(args.track_seed, args.bpm, args.key)
+        if not track:
+            parser.error("No track in the library matches that. Render one with app.py first.")
+        print(f"Painting {describe(track)}: {track['path']}")
+        args.audio = [track["path"]]
+    if args.workers > 1:
+        args.backend = "numpy"
+    if args.backend == "numpy" or len(args.audio) > 1:
+        args.headless = True
+    if (args.headless or args.check_analysis) and not args.audio:
+        parser.error(f"--{'check-analysis' if args.check_analysis else 'headless'} needs an audio file path")
+    return args
+
+def output_path_for(args, audio_file):
+    if len(args.audio) == 1:
+        return args.output
+    name = os.path.splitext(os.path.basename(audio_file))[0]
+    return os.path.join(args.out_dir, f"{name}.mp4")
 
 if __name__ == "__main__":
-    app = ArtGen()
-    app.run()
+    args = parse_args()
+    if args.profile is not None:
+        profiling.enable(args.profile or None)
+    if args.no_cache:
+        FEATURE_CACHE_DIR = None
+    if args.check_analysis:
+        sys.exit(0 if all([check_analysis(audio_file) for audio_file in args.audio]) else 1)
+    size = {"width": args.width, "height": args.height, "fps": args.fps}
+    if not args.audio:
+        ArtGen(mux=args.mux, seed=args.seed, **size).run(None, args.output)
+        sys.exit()
+
+    for audio_file in args.audio:
+        output_file = output_path_for(args, audio_file)
+        if args.backend == "numpy":
+            NumpyPainter(args.seed, args.workers, args.mux, **size).render(audio_file, output_file, args.checksum)
+        elif args.headless:
+            ArtGen(headless=True, mux=args.mux, seed=args.seed, **size).render_offline(audio_file, output_file)
+        else:
+            ArtGen(mux=args.mux, seed=args.seed, **size).run(audio_file, output_file)
@@ -0,0 +1,70 @@
+import os
+import struct
+import numpy as np
+
+# --- STREAMING WAV WRITER ---
+# Writes audio to disk block by block instead of holding the whole take/track in memory.
+# The header's size fields are patched on every flush, so the file is always readable.
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+
+class StreamingWavWriter:
+    """
+    Incremental WAV writer for float blocks in [-1, 1].
+    dtype "int16" writes 16-bit PCM (clipped), "float32" writes 32-bit float.
+    Blocks are shaped (frames,) for mono or (frames, channels).
+    """
+    def __init__(self, path, sample_rate, channels=1, dtype="int16"):
+        if dtype not in ("int16", "float32"):
+            raise ValueError(f"Unsupported WAV sample type: {dtype}")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = dtype
+        self.frames = 0
+        self.f = open(path, "wb")
+        self._write_header()
+
+    @property
+    def sample_width(self):
+        return 2 if self.dtype == "int16" else 4
+
+    def _write_header(self):
+        data_bytes = self.frames * self.channels * self.sample_width
+        block_align = self.channels * self.sample_width
+        fmt_tag = WAVE_FORMAT_PCM if self.dtype == "int16" else WAVE_FORMAT_IEEE_FLOAT
+        self.f.write(b"RIFF" + struct.pack("<I", 36 + data_bytes) + b"WAVE")
+        self.f.write(b"fmt " + struct.pack("<IHHIIHH", 16, fmt_tag, self.channels, self.sample_rate,
+                                           self.sample_rate * block_align, block_align, self.sample_width * 8))
+        self.f.write(b"data" + struct.pack("<I", data_bytes))
+
+    def write(self, block):
+        block = np.asarray(block)
+        if self.dtype == "int16":
+            data = (np.clip(block, -1.0, 1.0) * 32767).astype("<i2")
+        else:
+            data = block.astype("<f4")
+        self.f.write(data.tobytes())
+        self.frames += len(block)
+
+    def flush(self, sync=False):
+        """Patches the header to cover everything written so far. sync=True also forces it to disk."""
+        end = self.f.tell()
+        self.f.seek(0)
+        self._write_header()
+        self.f.seek(end)
+        self.f.flush()
+        if sync:
+            os.fsync(self.f.fileno())
+
+    def close(self):
+        if not self.f.closed:
+            self.flush()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()